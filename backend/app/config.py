@@ -39,11 +39,22 @@ class Settings(BaseSettings):
     # Security
     secret_key: str = "your-secret-key-change-in-production"
     access_token_expire_minutes: int = 30
+    cors_origins: list = ["http://localhost:8000", "http://localhost:3000"]
     
     # AI Model Settings
     embedding_model: str = "all-MiniLM-L6-v2"
     chunk_size: int = 1000
     chunk_overlap: int = 200
+    token_chunk_size: int = 200
+    token_chunk_overlap: int = 20
+    semantic_cache_size: int = 1024
+    semantic_cache_threshold: float = 0.95
+    rag_cache_size: int = 256
+    semantic_cache_path: str = "./cache/semantic_cache.pkl"
+    llm_pool_size: int = 8
+    llm_concurrency: int = 8
+    thread_pool_size: int = 16
+    fraud_score_noise: bool = True
     
     class Config:
         env_file = ".env"
@@ -6,12 +6,15 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 import asyncio
 
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from pymongo import IndexModel
+from cachetools import TTLCache
+from pymongo import AsyncMongoClient, IndexModel, ReturnDocument
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 import logging
 
 from .config import get_settings
+from .models.enums import Decision, decode_claim
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -21,14 +24,21 @@ class MongoDB:
     """MongoDB connection manager"""
     
     def __init__(self):
-        self.client: Optional[AsyncIOMotorClient] = None
-        self.database: Optional[AsyncIOMotorDatabase] = None
+        self.client: Optional[AsyncMongoClient] = None
+        self.database: Optional[AsyncDatabase] = None
         self.is_connected = False
-    
+
     async def connect(self):
         """Connect to MongoDB database"""
         try:
-            self.client = AsyncIOMotorClient(settings.mongodb_url)
+            self.client = AsyncMongoClient(
+                settings.mongodb_url,
+                maxPoolSize=50,
+                minPoolSize=10,
+                compressors="zstd",
+                retryWrites=True,
+                serverSelectionTimeoutMS=3000
+            )
             self.database = self.client[settings.mongodb_db_name]
             
             # Test connection
@@ -48,7 +58,7 @@ class MongoDB:
     async def disconnect(self):
         """Disconnect from MongoDB"""
         if self.client:
-            self.client.close()
+            await self.client.close()
             self.is_connected = False
             logger.info("Disconnected from MongoDB")
     
@@ -59,21 +69,21 @@ class MongoDB:
         
         # Documents collection indexes
         documents_indexes = [
-            IndexModel("document_id"),
+            IndexModel("document_id", unique=True),
             IndexModel("upload_timestamp"),
             IndexModel("policy_type"),
+            IndexModel("status"),
             IndexModel([("upload_timestamp", -1)])  # Descending order for recent documents
         ]
         await self.database.documents.create_indexes(documents_indexes)
         
         # Claims collection indexes
         claims_indexes = [
-            IndexModel("claim_id"),
+            IndexModel("claim_id", unique=True),
             IndexModel("document_id"),
             IndexModel("status"),
-            IndexModel("created_at"),
-            IndexModel([("created_at", -1)]),  # Recent claims first
-            IndexModel([("status", 1), ("created_at", -1)])  # Filter by status, sort by date
+            IndexModel([("created_at", -1)], background=True),  # Recent claims first
+            IndexModel([("decision", 1), ("created_at", -1)], background=True)  # Filter by decision, sort by date
         ]
         await self.database.claims.create_indexes(claims_indexes)
         
@@ -91,9 +101,11 @@ class MongoDB:
 class DocumentRepository:
     """Repository for document-related database operations"""
     
-    def __init__(self, database: AsyncIOMotorDatabase):
+    def __init__(self, database: AsyncDatabase):
         self.db = database
         self.collection = database.documents
+        self._stats_cache: TTLCache = TTLCache(maxsize=4, ttl=15)
+        self._stats_lock = asyncio.Lock()
     
     async def save_document(self, document_data: Dict[str, Any]) -> str:
         """Save document metadata to database"""
@@ -116,30 +128,69 @@ class DocumentRepository:
     
     async def get_document_by_id(self, document_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve document by document_id"""
-        document = await self.collection.find_one({"document_id": document_id})
-        if document:
-            document["_id"] = str(document["_id"])
-        return document
+        return await self.collection.find_one(
+            {"document_id": document_id}, projection={"_id": 0}
+        )
     
-    async def list_documents(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+    # Default projection for list views: only the fields a table row needs.
+    # _id is internal — suppressing it saves an ObjectId decode per row
+    LIST_PROJECTION = {
+        "_id": 0,
+        "document_id": 1,
+        "filename": 1,
+        "file_type": 1,
+        "policy_type": 1,
+        "upload_timestamp": 1,
+        "pages_processed": 1
+    }
+
+    async def list_documents(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        projection: Optional[Dict[str, int]] = None
+    ) -> List[Dict[str, Any]]:
         """List all documents with pagination"""
-        cursor = self.collection.find().sort("upload_timestamp", -1).skip(offset).limit(limit)
-        documents = []
-        
-        async for doc in cursor:
-            doc["_id"] = str(doc["_id"])
-            documents.append(doc)
-        
-        return documents
+        cursor = self.collection.find(
+            {}, projection=projection or self.LIST_PROJECTION
+        ).sort("upload_timestamp", -1).skip(offset).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def count_documents(self, query: Optional[Dict[str, Any]] = None) -> int:
+        """Count documents matching a query"""
+        return await self.collection.count_documents(query or {})
     
     async def delete_document(self, document_id: str) -> bool:
         """Delete document from database"""
         result = await self.collection.delete_one({"document_id": document_id})
         return result.deleted_count > 0
     
-    async def get_document_stats(self) -> Dict[str, Any]:
-        """Get document statistics"""
+    async def get_document_stats(
+        self,
+        since: Optional[datetime] = None,
+        force_refresh: bool = False
+    ) -> Dict[str, Any]:
+        """Get document statistics (cached for a few seconds for dashboard polling)"""
+        cache_key = since
+        if not force_refresh and cache_key in self._stats_cache:
+            return self._stats_cache[cache_key]
+
+        async with self._stats_lock:
+            # Double-check after acquiring the lock
+            if not force_refresh and cache_key in self._stats_cache:
+                return self._stats_cache[cache_key]
+            stats = await self._compute_document_stats(since)
+            self._stats_cache[cache_key] = stats
+            return stats
+
+    async def _compute_document_stats(self, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """Run the document statistics aggregation"""
+        match_stage = {"status": "processed"}
+        if since:
+            match_stage["upload_timestamp"] = {"$gte": since}
+
         pipeline = [
+            {"$match": match_stage},
             {
                 "$group": {
                     "_id": None,
@@ -151,7 +202,8 @@ class DocumentRepository:
             }
         ]
         
-        result = await self.collection.aggregate(pipeline).to_list(1)
+        cursor = await self.collection.aggregate(pipeline)
+        result = await cursor.to_list(1)
         if result:
             stats = result[0]
             stats.pop("_id", None)
@@ -168,20 +220,24 @@ class DocumentRepository:
 class ClaimRepository:
     """Repository for claim-related database operations"""
     
-    def __init__(self, database: AsyncIOMotorDatabase):
+    def __init__(self, database: AsyncDatabase):
         self.db = database
         self.collection = database.claims
+        self._stats_cache: TTLCache = TTLCache(maxsize=4, ttl=15)
+        self._stats_lock = asyncio.Lock()
     
-    async def save_claim(self, claim_data: Dict[str, Any]) -> str:
-        """Save claim record to database"""
-        claim_record = {
+    @staticmethod
+    def _build_claim_record(claim_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize raw claim data into the stored record shape"""
+        now = datetime.utcnow()
+        return {
             "claim_id": claim_data["claim_id"],
             "document_id": claim_data.get("document_id"),
             "claim_type": claim_data.get("claim_type"),
             "amount": claim_data.get("amount"),
             "description": claim_data.get("description"),
             "incident_date": claim_data.get("incident_date"),
-            "decision": claim_data["decision"],
+            "decision": Decision.encode(claim_data["decision"]),
             "explanation": claim_data["explanation"],
             "fraud_score": claim_data.get("fraud_score", 0.0),
             "fraud_risk_level": claim_data.get("fraud_risk_level", "UNKNOWN"),
@@ -190,39 +246,136 @@ class ClaimRepository:
             "policy_references": claim_data.get("policy_references", []),
             "processing_details": claim_data.get("processing_details", {}),
             "status": "processed",
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
+            "created_at": now,
+            "updated_at": now
         }
-        
-        result = await self.collection.insert_one(claim_record)
-        return str(result.inserted_id)
+
+    async def save_claim(self, claim_data: Dict[str, Any]) -> str:
+        """Save claim record to database (idempotent for retried requests)"""
+        claim_record = self._build_claim_record(claim_data)
+
+        try:
+            result = await self.collection.insert_one(claim_record)
+            return str(result.inserted_id)
+        except DuplicateKeyError:
+            # A retried request already inserted this claim; return the existing id
+            existing = await self.collection.find_one(
+                {"claim_id": claim_record["claim_id"]},
+                projection={"_id": 1}
+            )
+            return str(existing["_id"])
+
+    async def save_claims_bulk(self, claims_data: List[Dict[str, Any]]) -> List[str]:
+        """Save multiple claim records in a single bulk insert"""
+        if not claims_data:
+            return []
+
+        records = [self._build_claim_record(claim_data) for claim_data in claims_data]
+        result = await self.collection.insert_many(records, ordered=False)
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
     
     async def get_claim_by_id(self, claim_id: str) -> Optional[Dict[str, Any]]:
         """Retrieve claim by claim_id"""
-        claim = await self.collection.find_one({"claim_id": claim_id})
-        if claim:
-            claim["_id"] = str(claim["_id"])
-        return claim
-    
+        claim = await self.collection.find_one(
+            {"claim_id": claim_id}, projection={"_id": 0}
+        )
+        return decode_claim(claim)
+
+    async def get_claim_fields(
+        self,
+        claim_id: str,
+        fields: tuple
+    ) -> Optional[Dict[str, Any]]:
+        """Retrieve only the named fields of a claim
+
+        Cheaper than get_claim_by_id when the caller needs a handful of
+        fields — large subdocuments like processing_details are never
+        transferred or decoded.
+        """
+        projection = {field: 1 for field in fields}
+        projection["_id"] = 0
+        claim = await self.collection.find_one({"claim_id": claim_id}, projection)
+        return decode_claim(claim)
+
+    # Default projection for list views: only the fields a table row needs.
+    # _id is internal — suppressing it saves an ObjectId decode per row
+    LIST_PROJECTION = {
+        "_id": 0,
+        "claim_id": 1,
+        "decision": 1,
+        "amount": 1,
+        "claim_type": 1,
+        "fraud_risk_level": 1,
+        "created_at": 1,
+        "status": 1
+    }
+
     async def list_claims(
-        self, 
-        limit: int = 50, 
-        offset: int = 0, 
-        status_filter: Optional[str] = None
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        status_filter: Optional[str] = None,
+        after: Optional[datetime] = None,
+        projection: Optional[Dict[str, int]] = None
     ) -> List[Dict[str, Any]]:
-        """List claims with optional filtering"""
+        """List claims with optional filtering
+
+        Prefer keyset pagination via `after` (last seen created_at) — it stays
+        O(limit) regardless of depth, where `offset` still scans and discards.
+        `offset` is kept as a deprecated fallback for existing clients.
+        """
         query = {}
         if status_filter:
-            query["decision"] = status_filter
-        
-        cursor = self.collection.find(query).sort("created_at", -1).skip(offset).limit(limit)
-        claims = []
-        
-        async for claim in cursor:
-            claim["_id"] = str(claim["_id"])
-            claims.append(claim)
-        
+            query["decision"] = Decision.storage_filter(status_filter)
+        if after:
+            query["created_at"] = {"$lt": after}
+
+        cursor = self.collection.find(
+            query, projection=projection or self.LIST_PROJECTION
+        ).sort("created_at", -1)
+
+        if not after and offset:
+            cursor = cursor.skip(offset)
+
+        cursor = cursor.limit(limit)
+        claims = await cursor.to_list(length=limit)
+
+        for claim in claims:
+            decode_claim(claim)
+
         return claims
+
+    async def iter_claims(
+        self,
+        limit: int = 1000,
+        status_filter: Optional[str] = None,
+        after: Optional[datetime] = None,
+        projection: Optional[Dict[str, int]] = None
+    ):
+        """Stream claims one at a time without materializing the full page
+
+        Yields documents as the cursor batches arrive, keeping memory bounded
+        for large exports.
+        """
+        query = {}
+        if status_filter:
+            query["decision"] = Decision.storage_filter(status_filter)
+        if after:
+            query["created_at"] = {"$lt": after}
+
+        cursor = self.collection.find(
+            query, projection=projection or self.LIST_PROJECTION
+        ).sort("created_at", -1).limit(limit)
+
+        async for claim in cursor:
+            yield decode_claim(claim)
+
+    async def count_claims(self, status_filter: Optional[str] = None) -> int:
+        """Count claims matching an optional decision filter"""
+        query = {}
+        if status_filter:
+            query["decision"] = Decision.storage_filter(status_filter)
+        return await self.collection.count_documents(query)
     
     async def update_claim_status(self, claim_id: str, status: str, notes: Optional[str] = None) -> bool:
         """Update claim status (for manual review outcomes)"""
@@ -239,10 +392,58 @@ class ClaimRepository:
             {"$set": update_data}
         )
         return result.modified_count > 0
+
+    async def patch_status(
+        self,
+        claim_id: str,
+        status: str,
+        notes: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Update claim status in a single round-trip
+
+        Returns the updated claim (claim_id only) or None if no claim matched.
+        """
+        update_data = {
+            "status": status,
+            "updated_at": datetime.utcnow()
+        }
+
+        if notes:
+            update_data["manual_review_notes"] = notes
+
+        return await self.collection.find_one_and_update(
+            {"claim_id": claim_id},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER,
+            projection={"claim_id": 1}
+        )
     
-    async def get_claim_statistics(self) -> Dict[str, Any]:
-        """Get claim processing statistics"""
+    async def get_claim_statistics(
+        self,
+        since: Optional[datetime] = None,
+        force_refresh: bool = False
+    ) -> Dict[str, Any]:
+        """Get claim processing statistics (cached for a few seconds for dashboard polling)"""
+        cache_key = since
+        if not force_refresh and cache_key in self._stats_cache:
+            return self._stats_cache[cache_key]
+
+        async with self._stats_lock:
+            # Double-check after acquiring the lock
+            if not force_refresh and cache_key in self._stats_cache:
+                return self._stats_cache[cache_key]
+            stats = await self._compute_claim_statistics(since)
+            self._stats_cache[cache_key] = stats
+            return stats
+
+    async def _compute_claim_statistics(self, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """Run the claim statistics aggregation"""
+        match_stage = {"status": "processed"}
+        if since:
+            match_stage["created_at"] = {"$gte": since}
+
         pipeline = [
+            {"$match": match_stage},
             {
                 "$group": {
                     "_id": "$decision",
@@ -254,7 +455,8 @@ class ClaimRepository:
             }
         ]
         
-        results = await self.collection.aggregate(pipeline).to_list(10)
+        cursor = await self.collection.aggregate(pipeline)
+        results = await cursor.to_list(10)
         
         stats = {
             "total_claims": 0,
@@ -266,7 +468,7 @@ class ClaimRepository:
         }
         
         for result in results:
-            decision = result["_id"].lower().replace(" ", "_")
+            decision = str(Decision.decode(result["_id"])).lower().replace(" ", "_")
             count = result["count"]
             
             stats["total_claims"] += count
@@ -321,7 +523,7 @@ async def close_db():
     await mongodb.disconnect()
 
 
-def get_db() -> AsyncIOMotorDatabase:
+def get_db() -> AsyncDatabase:
     """Dependency to get database instance"""
     if not mongodb.database:
         raise RuntimeError("Database not initialized")
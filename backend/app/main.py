@@ -1,6 +1,12 @@
 """
 Insurance AI Assistant - Main FastAPI Application
 """
+import asyncio
+import concurrent.futures
+import logging
+import logging.handlers
+import queue
+
 from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -10,7 +16,9 @@ from pathlib import Path
 
 from .config import get_settings
 from .routers import documents, queries, claims, health
+from . import database
 from .database import init_db
+from .utils.responses import ORJSONResponse
 
 # Get settings
 settings = get_settings()
@@ -21,16 +29,19 @@ app = FastAPI(
     description="AI-powered insurance document analysis and claim processing system",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse
 )
 
-# Add CORS middleware
+# Add CORS middleware with an explicit allow-list so the middleware can
+# short-circuit origin checks, and cache preflight responses client-side
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
+    allow_origins=tuple(settings.cors_origins),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=("GET", "POST", "PATCH", "DELETE"),
+    allow_headers=("content-type", "authorization"),
+    max_age=86400,
 )
 
 # Mount static files
@@ -42,11 +53,85 @@ app.include_router(documents.router, prefix="/api/v1")
 app.include_router(queries.router, prefix="/api/v1")
 app.include_router(claims.router, prefix="/api/v1")
 
+# Background log listener (log I/O happens off the request coroutines)
+_log_listener: logging.handlers.QueueListener = None
+
+
+def _setup_queue_logging():
+    """Route all logging through a queue so handlers never block the event loop"""
+    global _log_listener
+    root = logging.getLogger()
+
+    if any(isinstance(h, logging.handlers.QueueHandler) for h in root.handlers):
+        return
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+
+    _log_listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, respect_handler_level=True
+    )
+    _log_listener.start()
+
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and services on startup"""
+    _setup_queue_logging()
+
+    # asyncio.to_thread offloads (fraud scoring, blocking file I/O) share
+    # the loop's default executor — size it explicitly instead of relying
+    # on the CPU-count-derived default
+    asyncio.get_event_loop().set_default_executor(
+        concurrent.futures.ThreadPoolExecutor(
+            max_workers=settings.thread_pool_size, thread_name_prefix="worker"
+        )
+    )
+
     await init_db()
 
+    # Lifespan-scoped repository singletons: handlers read these off
+    # request.app.state instead of calling module-level getters per request
+    app.state.document_repo = database.document_repo
+    app.state.claim_repo = database.claim_repo
+
+    # Warm the embedding model and vector collection so the first real
+    # request doesn't pay for kernel warmup and cold SQLite pages
+    try:
+        import torch
+        from .services.vector_store import get_vector_store
+
+        torch.set_grad_enabled(False)
+        vector_store = get_vector_store()
+        vector_store.embedding_model.eval()
+
+        warmup_embedding = await vector_store._generate_embeddings(["warmup"])
+        vector_store.collection.query(
+            query_embeddings=warmup_embedding.tolist(),
+            n_results=1
+        )
+    except Exception as e:
+        logging.getLogger(__name__).warning("Vector store warmup failed: %s", e)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Persist warm caches and flush the log listener on shutdown"""
+    try:
+        from .services.ai_service import ai_service
+        ai_service.save_semantic_cache()
+    except Exception as e:
+        logging.getLogger(__name__).warning("Semantic cache save failed: %s", e)
+
+    if _log_listener:
+        _log_listener.stop()
+
 @app.get("/", response_class=HTMLResponse)
 async def root():
     """Serve the frontend application"""
@@ -0,0 +1,67 @@
+"""
+Storage enums for compact claim encoding
+
+Claim decisions are persisted as single-byte integer codes instead of the
+10-20 byte strings the API exposes, shrinking both documents and the
+(decision, created_at) index. The API surface keeps the string form; the
+repository encodes on write and decodes on read.
+"""
+from enum import IntEnum
+from typing import Any, Optional
+
+
+class Decision(IntEnum):
+    """Claim decision codes as stored in MongoDB"""
+    APPROVED = 1
+    DENIED = 2
+    REQUIRES_REVIEW = 3
+    ERROR = 4
+
+    @classmethod
+    def encode(cls, value: Any) -> Any:
+        """Translate an API decision string to its storage code
+
+        Unknown values pass through unchanged so legacy data and ad-hoc
+        filters keep working.
+        """
+        if isinstance(value, cls):
+            return int(value)
+        if isinstance(value, str):
+            try:
+                return int(cls[value.upper().replace(" ", "_")])
+            except KeyError:
+                return value
+        return value
+
+    @classmethod
+    def storage_filter(cls, value: Any) -> Any:
+        """Mongo filter value matching both storage forms of a decision
+
+        Claims written before the integer encoding still hold the string
+        form, so filtered queries match either until a migration rewrites
+        them. Unknown values fall back to the raw pass-through.
+        """
+        code = cls.encode(value)
+        if isinstance(code, int):
+            return {"$in": [code, cls(code).name]}
+        return code
+
+    @classmethod
+    def decode(cls, value: Any) -> Any:
+        """Translate a storage code back to the API decision string
+
+        Legacy documents that still hold strings pass through unchanged.
+        """
+        if isinstance(value, int):
+            try:
+                return cls(value).name
+            except ValueError:
+                return value
+        return value
+
+
+def decode_claim(claim: Optional[dict]) -> Optional[dict]:
+    """Decode storage enums in a claim document in place"""
+    if claim and "decision" in claim:
+        claim["decision"] = Decision.decode(claim["decision"])
+    return claim
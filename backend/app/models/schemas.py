@@ -1,11 +1,21 @@
 """
 Pydantic Models for API Request/Response Schemas
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 
+class FastModel(BaseModel):
+    """Base for hot request/response types
+
+    Pydantic v2 validation runs in pydantic-core (Rust); this base keeps
+    the hot models on the cheapest configuration — unknown fields are
+    dropped instead of stored, and str fields skip coercion checks.
+    """
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=False)
+
+
 class DocumentResponse(BaseModel):
     """Response model for document upload"""
     success: bool
@@ -18,21 +28,21 @@ class DocumentResponse(BaseModel):
     database_record_id: Optional[str] = None
 
 
-class DocumentInfo(BaseModel):
-    """Document information model"""
+class DocumentInfo(FastModel):
+    """Document information model (list views project a subset of fields)"""
     document_id: str
     filename: str
     file_type: str
     policy_type: Optional[str] = None
-    text_length: int
-    pages_processed: int
-    chunks_created: int
-    processing_time: float
-    upload_timestamp: datetime
-    status: str
+    text_length: Optional[int] = None
+    pages_processed: Optional[int] = None
+    chunks_created: Optional[int] = None
+    processing_time: Optional[float] = None
+    upload_timestamp: Optional[datetime] = None
+    status: Optional[str] = None
 
 
-class DocumentListResponse(BaseModel):
+class DocumentListResponse(FastModel):
     """Response model for document listing"""
     documents: List[DocumentInfo]
     total: int
@@ -40,13 +50,13 @@ class DocumentListResponse(BaseModel):
     offset: int
 
 
-class QueryRequest(BaseModel):
+class QueryRequest(FastModel):
     """Request model for policy questions"""
     query: str = Field(..., description="User's question about the policy")
     document_id: Optional[str] = Field(None, description="Optional specific document to search")
 
 
-class ClauseInfo(BaseModel):
+class ClauseInfo(FastModel):
     """Information about a relevant policy clause"""
     text: str
     confidence: float
@@ -54,7 +64,7 @@ class ClauseInfo(BaseModel):
     metadata: Dict[str, Any] = {}
 
 
-class QueryResponse(BaseModel):
+class QueryResponse(FastModel):
     """Response model for policy questions"""
     answer: str
     relevant_clauses: List[ClauseInfo]
@@ -63,7 +73,7 @@ class QueryResponse(BaseModel):
     context_used: bool
 
 
-class ClaimRequest(BaseModel):
+class ClaimRequest(FastModel):
     """Request model for insurance claims"""
     claim_type: str = Field(..., description="Type of claim (medical, dental, vision, accident, property, other)")
     amount: float = Field(..., description="Claim amount in dollars")
@@ -79,7 +89,7 @@ class PolicyReference(BaseModel):
     relevance_score: Optional[float] = None
 
 
-class ClaimResponse(BaseModel):
+class ClaimResponse(FastModel):
     """Response model for claim processing"""
     claim_id: str
     decision: str
@@ -90,31 +100,33 @@ class ClaimResponse(BaseModel):
     policy_references: List[PolicyReference]
     ai_confidence: float
     processing_details: Dict[str, Any]
+    cached: bool = False
 
 
-class ClaimInfo(BaseModel):
-    """Claim information model"""
+class ClaimInfo(FastModel):
+    """Claim information model (list views project a subset of fields)"""
     claim_id: str
-    document_id: Optional[str]
-    claim_type: str
-    amount: float
-    description: str
-    incident_date: str
-    decision: str
-    explanation: str
-    fraud_score: float
-    fraud_risk_level: str
-    ai_confidence: float
-    created_at: datetime
-    status: str
-
-
-class ClaimListResponse(BaseModel):
+    document_id: Optional[str] = None
+    claim_type: Optional[str] = None
+    amount: Optional[float] = None
+    description: Optional[str] = None
+    incident_date: Optional[str] = None
+    decision: Optional[str] = None
+    explanation: Optional[str] = None
+    fraud_score: Optional[float] = None
+    fraud_risk_level: Optional[str] = None
+    ai_confidence: Optional[float] = None
+    created_at: Optional[datetime] = None
+    status: Optional[str] = None
+
+
+class ClaimListResponse(FastModel):
     """Response model for claim listing"""
     claims: List[ClaimInfo]
     total: int
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
 
 
 class SystemStats(BaseModel):
@@ -2,21 +2,52 @@
 Claims Router
 Handles insurance claim processing with AI-powered decision making
 """
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Optional
 from datetime import datetime
+import asyncio
+import hashlib
+import logging
+
+import orjson
+from cachetools import TTLCache
 
 from ..services.claim_service import claim_service
 from ..services.notification_service import notification_service
-from ..database import get_claim_repo
+from ..database import ClaimRepository
 from ..models.schemas import ClaimRequest, ClaimResponse, ClaimListResponse
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=["Claims"])
 
 
+# Short-window dedup of identical submissions (double-clicks, mobile
+# retries): identical claims within the TTL return the cached decision
+# instead of re-running the AI pipeline and the DB write
+request_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+_request_locks: Dict[str, asyncio.Lock] = {}
+
+
+def _dedup_key(claim_data: Dict[str, Any]) -> str:
+    """Stable hash of the canonical claim payload"""
+    payload = orjson.dumps(claim_data, default=str, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _claim_repo(request: Request) -> ClaimRepository:
+    """Fetch the lifespan-scoped claim repository from app state"""
+    repo = getattr(request.app.state, "claim_repo", None)
+    if repo is None:
+        raise RuntimeError("Claim repository not initialized")
+    return repo
+
+
 @router.post("/claims/process", response_model=ClaimResponse)
 async def process_claim(
     request: ClaimRequest,
+    http_request: Request,
     email: Optional[str] = None,
     phone: Optional[str] = None
 ) -> Dict[str, Any]:
@@ -56,48 +87,80 @@ async def process_claim(
         )
     
     try:
-        # Convert request to dictionary
-        claim_data = request.dict()
-        
-        # Process claim using the claim service
-        result = await claim_service.process_claim(
-            claim_data=claim_data,
-            document_id=request.document_id
-        )
-        
-        # Save claim to database
+        # Convert request to dictionary via the Pydantic v2 core serializer
+        claim_data = request.model_dump()
+
+        # Duplicate submissions within the cache TTL short-circuit both the
+        # AI pipeline and the DB write; a per-key lock coalesces concurrent
+        # duplicates into a single processing run
+        dedup_key = _dedup_key(claim_data)
+        cached = request_cache.get(dedup_key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        lock = _request_locks.setdefault(dedup_key, asyncio.Lock())
         try:
-            claim_repo = get_claim_repo()
-            
-            # Prepare claim data for database
-            claim_record = {**claim_data, **result}
-            db_record_id = await claim_repo.save_claim(claim_record)
-            result['database_record_id'] = db_record_id
-            
-        except Exception as e:
-            print(f"Warning: Failed to save claim to database: {e}")
-            result['database_record_id'] = None
-        
-        # Send notifications if contact info provided
-        if email or phone:
-            try:
-                notification_data = {**claim_data, **result}
-                notification_result = await notification_service.notify_claim_decision(
-                    claim_data=notification_data,
-                    email=email,
-                    phone=phone
+            async with lock:
+                cached = request_cache.get(dedup_key)
+                if cached is not None:
+                    return {**cached, "cached": True}
+
+                # Process claim using the claim service
+                result = await claim_service.process_claim(
+                    claim_data=claim_data,
+                    document_id=request.document_id
                 )
-                result['notification_sent'] = notification_result
-                
-            except Exception as e:
-                print(f"Warning: Failed to send notifications: {e}")
-                result['notification_sent'] = {
-                    'success': False,
-                    'error': str(e)
-                }
-        
-        return result
-        
+
+                # Save claim and dispatch notifications concurrently — both are
+                # independent I/O and notification latency usually dominates
+                async def save_to_db():
+                    claim_repo = _claim_repo(http_request)
+                    claim_record = {**claim_data, **result}
+                    return await claim_repo.save_claim(claim_record)
+
+                async def send_notifications():
+                    notification_data = {**claim_data, **result}
+                    return await notification_service.notify_claim_decision(
+                        claim_data=notification_data,
+                        email=email,
+                        phone=phone
+                    )
+
+                if email or phone:
+                    save_res, notify_res = await asyncio.gather(
+                        save_to_db(), send_notifications(), return_exceptions=True
+                    )
+                else:
+                    save_res = await asyncio.gather(save_to_db(), return_exceptions=True)
+                    save_res = save_res[0]
+                    notify_res = None
+
+                if isinstance(save_res, Exception):
+                    logger.warning("Failed to save claim to database: %s", save_res)
+                    result['database_record_id'] = None
+                else:
+                    result['database_record_id'] = save_res
+
+                if email or phone:
+                    if isinstance(notify_res, Exception):
+                        logger.warning("Failed to send notifications: %s", notify_res)
+                        result['notification_sent'] = {
+                            'success': False,
+                            'error': str(notify_res)
+                        }
+                    else:
+                        result['notification_sent'] = notify_res
+
+                # Only replayable outcomes are worth caching: an ERROR
+                # decision is a transient pipeline failure the client
+                # should be able to retry immediately, and a missed DB
+                # save would replay database_record_id: None for the TTL
+                if result.get('decision') != 'ERROR' and result.get('database_record_id'):
+                    request_cache[dedup_key] = result
+                return result
+        finally:
+            _request_locks.pop(dedup_key, None)
+
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -105,18 +168,102 @@ async def process_claim(
         )
 
 
+@router.post("/claims/process-batch")
+async def process_claims_batch(
+    claims: List[ClaimRequest],
+    http_request: Request,
+    document_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Process a batch of insurance claims in one request
+
+    Runs fraud detection once over the whole batch and shares policy
+    retrieval between claims of the same type, then persists all results
+    in a single bulk insert — substantially cheaper than submitting the
+    claims one by one.
+
+    - **claims**: List of claims (same shape as /claims/process)
+    - **document_id**: Optional policy document to check the batch against
+    """
+
+    if not claims:
+        raise HTTPException(
+            status_code=400,
+            detail="Batch must contain at least one claim"
+        )
+
+    if len(claims) > 100:
+        raise HTTPException(
+            status_code=400,
+            detail="Batch cannot exceed 100 claims"
+        )
+
+    for i, claim in enumerate(claims):
+        if claim.amount <= 0:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Claim {i}: amount must be greater than 0"
+            )
+        if claim.amount > 1000000:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Claim {i}: amount exceeds maximum limit of $1,000,000"
+            )
+        if len(claim.description.strip()) < 10:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Claim {i}: description must be at least 10 characters long"
+            )
+
+    try:
+        claim_dicts = [claim.model_dump() for claim in claims]
+        results = await claim_service.process_claims_batch(
+            claim_dicts, document_id=document_id
+        )
+
+        records = [
+            {**claim_data, **result}
+            for claim_data, result in zip(claim_dicts, results)
+        ]
+        try:
+            claim_repo = _claim_repo(http_request)
+            record_ids = await claim_repo.save_claims_bulk(records)
+        except Exception as e:
+            logger.warning("Failed to save claim batch to database: %s", e)
+            record_ids = [None] * len(results)
+
+        for result, record_id in zip(results, record_ids):
+            result['database_record_id'] = record_id
+
+        return {
+            "results": results,
+            "count": len(results)
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to process claim batch: {str(e)}"
+        )
+
+
 @router.get("/claims", response_model=ClaimListResponse)
 async def list_claims(
+    http_request: Request,
     limit: int = 50,
     offset: int = 0,
-    status_filter: Optional[str] = None
+    status_filter: Optional[str] = None,
+    after: Optional[datetime] = None
 ) -> Dict[str, Any]:
     """
     List processed claims with optional filtering
-    
+
     - **limit**: Maximum number of claims to return (max 100)
-    - **offset**: Number of claims to skip for pagination
+    - **offset**: Number of claims to skip for pagination (deprecated, prefer `after`)
     - **status_filter**: Filter by decision status (APPROVED, DENIED, REQUIRES_REVIEW)
+    - **after**: Keyset cursor — pass the previous page's `next_cursor` to fetch the next page
     """
     
     if limit > 100:
@@ -132,18 +279,27 @@ async def list_claims(
         )
     
     try:
-        claim_repo = get_claim_repo()
-        claims = await claim_repo.list_claims(
-            limit=limit,
-            offset=offset,
-            status_filter=status_filter
+        claim_repo = _claim_repo(http_request)
+        claims, total = await asyncio.gather(
+            claim_repo.list_claims(
+                limit=limit,
+                offset=offset,
+                status_filter=status_filter,
+                after=after
+            ),
+            claim_repo.count_claims(status_filter=status_filter)
         )
-        
+
+        next_cursor = None
+        if len(claims) == limit and claims[-1].get("created_at"):
+            next_cursor = claims[-1]["created_at"].isoformat()
+
         return {
             "claims": claims,
-            "total": len(claims),
+            "total": total,
             "limit": limit,
             "offset": offset,
+            "next_cursor": next_cursor,
             "filter_applied": status_filter
         }
         
@@ -154,12 +310,50 @@ async def list_claims(
         )
 
 
+@router.get("/claims/stream")
+async def stream_claims(
+    http_request: Request,
+    limit: int = 1000,
+    status_filter: Optional[str] = None,
+    after: Optional[datetime] = None
+) -> StreamingResponse:
+    """
+    Stream claims as newline-delimited JSON
+
+    Unlike /claims, this keeps server memory bounded and lets clients start
+    parsing before the full result set has been fetched — intended for large
+    exports.
+
+    - **limit**: Maximum number of claims to stream (max 10000)
+    - **status_filter**: Filter by decision status (APPROVED, DENIED, REQUIRES_REVIEW)
+    - **after**: Keyset cursor (last seen created_at)
+    """
+
+    if limit > 10000:
+        raise HTTPException(
+            status_code=400,
+            detail="Limit cannot exceed 10000"
+        )
+
+    claim_repo = _claim_repo(http_request)
+
+    async def generate():
+        async for claim in claim_repo.iter_claims(
+            limit=limit,
+            status_filter=status_filter,
+            after=after
+        ):
+            yield orjson.dumps(claim, default=str) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 @router.get("/claims/{claim_id}")
-async def get_claim(claim_id: str) -> Dict[str, Any]:
+async def get_claim(claim_id: str, http_request: Request) -> Dict[str, Any]:
     """Get detailed information about a specific claim"""
     
     try:
-        claim_repo = get_claim_repo()
+        claim_repo = _claim_repo(http_request)
         claim = await claim_repo.get_claim_by_id(claim_id)
         
         if not claim:
@@ -182,6 +376,7 @@ async def get_claim(claim_id: str) -> Dict[str, Any]:
 @router.patch("/claims/{claim_id}/status")
 async def update_claim_status(
     claim_id: str,
+    http_request: Request,
     status: str,
     notes: Optional[str] = None
 ) -> Dict[str, Any]:
@@ -203,29 +398,21 @@ async def update_claim_status(
         )
     
     try:
-        claim_repo = get_claim_repo()
-        
-        # Check if claim exists
-        existing_claim = await claim_repo.get_claim_by_id(claim_id)
-        if not existing_claim:
-            raise HTTPException(
-                status_code=404,
-                detail="Claim not found"
-            )
-        
-        # Update claim status
-        updated = await claim_repo.update_claim_status(
+        claim_repo = _claim_repo(http_request)
+
+        # Single round-trip: update and detect missing claim at once
+        updated_claim = await claim_repo.patch_status(
             claim_id=claim_id,
             status=status.lower(),
             notes=notes
         )
-        
-        if not updated:
+
+        if not updated_claim:
             raise HTTPException(
-                status_code=500,
-                detail="Failed to update claim status"
+                status_code=404,
+                detail="Claim not found"
             )
-        
+
         return {
             "success": True,
             "claim_id": claim_id,
@@ -244,14 +431,14 @@ async def update_claim_status(
 
 
 @router.get("/claims/stats/summary")
-async def get_claims_statistics() -> Dict[str, Any]:
+async def get_claims_statistics(http_request: Request, force_refresh: bool = False) -> Dict[str, Any]:
     """Get claims processing statistics and analytics"""
-    
+
     try:
         # Get database statistics
         try:
-            claim_repo = get_claim_repo()
-            db_stats = await claim_repo.get_claim_statistics()
+            claim_repo = _claim_repo(http_request)
+            db_stats = await claim_repo.get_claim_statistics(force_refresh=force_refresh)
         except Exception:
             db_stats = {"error": "Database unavailable"}
         
@@ -281,7 +468,7 @@ async def get_claims_statistics() -> Dict[str, Any]:
 
 
 @router.post("/claims/{claim_id}/reprocess")
-async def reprocess_claim(claim_id: str) -> Dict[str, Any]:
+async def reprocess_claim(claim_id: str, http_request: Request) -> Dict[str, Any]:
     """
     Reprocess a claim with updated AI models or policy documents
     
@@ -289,10 +476,15 @@ async def reprocess_claim(claim_id: str) -> Dict[str, Any]:
     """
     
     try:
-        claim_repo = get_claim_repo()
-        
-        # Get existing claim
-        existing_claim = await claim_repo.get_claim_by_id(claim_id)
+        claim_repo = _claim_repo(http_request)
+
+        # Fetch only the fields reprocessing needs — skips deserializing
+        # explanation, policy_references and processing_details
+        existing_claim = await claim_repo.get_claim_fields(
+            claim_id,
+            ("claim_type", "amount", "description", "incident_date",
+             "document_id", "decision")
+        )
         if not existing_claim:
             raise HTTPException(
                 status_code=404,
@@ -2,24 +2,41 @@
 Documents Router
 Handles document upload, processing, and management
 """
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Request
 from typing import Dict, Any, List, Optional
 import asyncio
+import logging
+import tempfile
 
 from ..services.document_processor import document_processor
-from ..services.vector_store import vector_store
-from ..services.notification_service import notification_service
-from ..database import get_document_repo
+from ..services.vector_store import get_vector_store
+from ..services.notification_service import notification_queue
+from ..database import DocumentRepository
 from ..models.schemas import DocumentResponse, DocumentListResponse
+from ..utils.rate_limit import upload_rate_limit
 from ..config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Documents"])
 
 
-@router.post("/documents/upload", response_model=DocumentResponse)
+def _document_repo(request: Request) -> DocumentRepository:
+    """Fetch the lifespan-scoped document repository from app state"""
+    repo = getattr(request.app.state, "document_repo", None)
+    if repo is None:
+        raise RuntimeError("Document repository not initialized")
+    return repo
+
+
+@router.post(
+    "/documents/upload",
+    response_model=DocumentResponse,
+    dependencies=[Depends(upload_rate_limit)]
+)
 async def upload_document(
+    http_request: Request,
     file: UploadFile = File(...),
     policy_type: Optional[str] = Form(None),
     email: Optional[str] = Form(None)
@@ -39,46 +56,58 @@ async def upload_document(
             detail=f"Unsupported file type. Supported types: {document_processor.get_supported_file_types()}"
         )
     
-    # Read file content
-    file_content = await file.read()
-    
-    if not document_processor.validate_file_size(len(file_content)):
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Maximum size: {settings.max_file_size / (1024*1024):.1f}MB"
-        )
-    
+    # Stream the upload into a spooled temp file (spills to disk past 8MB)
+    # instead of buffering the whole file in memory; reject oversized
+    # uploads as soon as the running total crosses the limit
+    spool = tempfile.SpooledTemporaryFile(max_size=8 << 20)
+    file_size = 0
+    while chunk := await file.read(1 << 20):
+        file_size += len(chunk)
+        if not document_processor.validate_file_size(file_size):
+            spool.close()
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum size: {settings.max_file_size / (1024*1024):.1f}MB"
+            )
+        spool.write(chunk)
+
     try:
         # Process document
         processing_result = await document_processor.process_document(
-            file_content=file_content,
+            file_content=spool,
             filename=file.filename,
             policy_type=policy_type
         )
         
-        # Store document chunks in vector database
-        vector_result = await vector_store.store_document_chunks(
-            processing_result['chunks']
+        # Vector write and metadata save are independent — run them
+        # concurrently instead of back to back
+        async def store_vectors():
+            return await get_vector_store().store_document_chunks(
+                processing_result['chunks']
+            )
+
+        async def save_to_db():
+            document_repo = _document_repo(http_request)
+            return await document_repo.save_document(processing_result)
+
+        vector_result, db_res = await asyncio.gather(
+            store_vectors(), save_to_db(), return_exceptions=True
         )
-        
-        # Save document metadata to database
-        try:
-            document_repo = get_document_repo()
-            db_record_id = await document_repo.save_document(processing_result)
-        except Exception as e:
+
+        if isinstance(vector_result, Exception):
+            raise vector_result
+
+        if isinstance(db_res, Exception):
             # Continue even if database save fails
-            print(f"Warning: Failed to save document to database: {e}")
+            logger.warning("Failed to save document to database: %s", db_res)
             db_record_id = None
-        
-        # Send notification if email provided
+        else:
+            db_record_id = db_res
+
+        # Notification goes through the batched background queue — burst
+        # ingestion shares deliveries instead of one SMTP session per upload
         if email:
-            try:
-                await notification_service.notify_document_processed(
-                    document_data=processing_result,
-                    email=email
-                )
-            except Exception as e:
-                print(f"Warning: Failed to send notification: {e}")
+            notification_queue.enqueue(email, processing_result)
         
         return {
             "success": True,
@@ -95,22 +124,28 @@ async def upload_document(
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+    finally:
+        spool.close()
 
 
 @router.get("/documents", response_model=DocumentListResponse)
 async def list_documents(
+    http_request: Request,
     limit: int = 50,
     offset: int = 0
 ) -> Dict[str, Any]:
     """List uploaded documents with pagination"""
     
     try:
-        document_repo = get_document_repo()
-        documents = await document_repo.list_documents(limit=limit, offset=offset)
-        
+        document_repo = _document_repo(http_request)
+        documents, total = await asyncio.gather(
+            document_repo.list_documents(limit=limit, offset=offset),
+            document_repo.count_documents()
+        )
+
         return {
             "documents": documents,
-            "total": len(documents),
+            "total": total,
             "limit": limit,
             "offset": offset
         }
@@ -120,11 +155,11 @@ async def list_documents(
 
 
 @router.get("/documents/{document_id}")
-async def get_document(document_id: str) -> Dict[str, Any]:
+async def get_document(document_id: str, http_request: Request) -> Dict[str, Any]:
     """Get document details by ID"""
     
     try:
-        document_repo = get_document_repo()
+        document_repo = _document_repo(http_request)
         document = await document_repo.get_document_by_id(document_id)
         
         if not document:
@@ -139,19 +174,19 @@ async def get_document(document_id: str) -> Dict[str, Any]:
 
 
 @router.delete("/documents/{document_id}")
-async def delete_document(document_id: str) -> Dict[str, Any]:
+async def delete_document(document_id: str, http_request: Request) -> Dict[str, Any]:
     """Delete document and associated data"""
     
     try:
         # Delete from vector store
-        vector_deleted = await vector_store.delete_document(document_id)
+        vector_deleted = await get_vector_store().delete_document(document_id)
         
         # Delete from database
         try:
-            document_repo = get_document_repo()
+            document_repo = _document_repo(http_request)
             db_deleted = await document_repo.delete_document(document_id)
         except Exception as e:
-            print(f"Warning: Failed to delete from database: {e}")
+            logger.warning("Failed to delete from database: %s", e)
             db_deleted = False
         
         if not vector_deleted and not db_deleted:
@@ -175,7 +210,7 @@ async def get_document_chunks(document_id: str) -> Dict[str, Any]:
     """Get all text chunks for a document"""
     
     try:
-        chunks = await vector_store.get_document_chunks(document_id)
+        chunks = await get_vector_store().get_document_chunks(document_id)
         
         if not chunks:
             raise HTTPException(status_code=404, detail="Document or chunks not found")
@@ -193,20 +228,20 @@ async def get_document_chunks(document_id: str) -> Dict[str, Any]:
 
 
 @router.get("/documents/stats/summary")
-async def get_document_stats() -> Dict[str, Any]:
+async def get_document_stats(http_request: Request, force_refresh: bool = False) -> Dict[str, Any]:
     """Get document processing statistics"""
-    
+
     try:
         # Get database stats
         try:
-            document_repo = get_document_repo()
-            db_stats = await document_repo.get_document_stats()
+            document_repo = _document_repo(http_request)
+            db_stats = await document_repo.get_document_stats(force_refresh=force_refresh)
         except Exception:
             db_stats = {"error": "Database unavailable"}
         
         # Get vector store stats
         try:
-            vector_stats = vector_store.get_collection_stats()
+            vector_stats = get_vector_store().get_collection_stats()
         except Exception:
             vector_stats = {"error": "Vector store unavailable"}
         
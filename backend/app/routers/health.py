@@ -2,12 +2,12 @@
 Health Check Router
 Provides system health and status endpoints
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from typing import Dict, Any
 from datetime import datetime
 
-from ..database import mongodb, get_document_repo, get_claim_repo
-from ..services.vector_store import vector_store
+from ..database import mongodb
+from ..services.vector_store import get_vector_store
 from ..services.notification_service import notification_service
 
 router = APIRouter(tags=["Health"])
@@ -36,7 +36,7 @@ async def detailed_health_check() -> Dict[str, Any]:
     
     # Check vector store
     try:
-        vector_stats = vector_store.get_collection_stats()
+        vector_stats = get_vector_store().get_collection_stats()
         vector_status = {
             "available": True,
             "stats": vector_stats
@@ -68,9 +68,33 @@ async def detailed_health_check() -> Dict[str, Any]:
     }
 
 
+@router.get("/health/pool")
+async def connection_pool_status() -> Dict[str, Any]:
+    """Inspect the shared MongoDB connection pool
+
+    The client is a process-wide singleton created at startup; this
+    endpoint confirms its pooling configuration and the servers it is
+    currently attached to.
+    """
+    if not mongodb.client:
+        return {"connected": False}
+
+    pool_options = mongodb.client.options.pool_options
+    return {
+        "connected": mongodb.is_connected,
+        "max_pool_size": pool_options.max_pool_size,
+        "min_pool_size": pool_options.min_pool_size,
+        "nodes": [f"{host}:{port}" for host, port in mongodb.client.nodes],
+    }
+
+
 @router.get("/health/stats")
-async def system_stats() -> Dict[str, Any]:
-    """Get system statistics"""
+async def system_stats(request: Request, refresh: bool = False) -> Dict[str, Any]:
+    """Get system statistics
+
+    Pass refresh=true to re-sync the vector store's chunk counter from
+    ChromaDB instead of serving the locally maintained value.
+    """
     
     stats = {
         "documents": {"error": "Service unavailable"},
@@ -81,9 +105,9 @@ async def system_stats() -> Dict[str, Any]:
     try:
         # Document statistics
         if mongodb.is_connected:
-            document_repo = get_document_repo()
-            claim_repo = get_claim_repo()
-            
+            document_repo = request.app.state.document_repo
+            claim_repo = request.app.state.claim_repo
+
             stats["documents"] = await document_repo.get_document_stats()
             stats["claims"] = await claim_repo.get_claim_statistics()
     except Exception as e:
@@ -91,7 +115,7 @@ async def system_stats() -> Dict[str, Any]:
     
     try:
         # Vector store statistics
-        stats["vector_store"] = vector_store.get_collection_stats()
+        stats["vector_store"] = get_vector_store().get_collection_stats(refresh=refresh)
     except Exception as e:
         stats["vector_store"] = {"error": str(e)}
     
@@ -2,16 +2,75 @@
 Queries Router
 Handles policy questions and AI-powered responses
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any
 
+import orjson
+
 from ..services.ai_service import ai_service
 from ..models.schemas import QueryRequest, QueryResponse
+from ..utils.rate_limit import query_rate_limit
 
 router = APIRouter(tags=["Queries"])
 
+# The suggestion list is fully static — serialize it once at import and
+# serve the cached bytes instead of rebuilding and re-encoding per call
+_SUGGESTIONS = [
+    {
+        "category": "Coverage",
+        "questions": [
+            "What is covered under my health insurance policy?",
+            "Is emergency room treatment covered?",
+            "What is my deductible amount?",
+            "Are prescription medications covered?",
+            "What is the coverage limit for dental procedures?"
+        ]
+    },
+    {
+        "category": "Claims",
+        "questions": [
+            "How do I file a claim?",
+            "What documents are needed for a claim?",
+            "How long does claim processing take?",
+            "What is the claim approval process?",
+            "Can I appeal a denied claim?"
+        ]
+    },
+    {
+        "category": "Exclusions",
+        "questions": [
+            "What is not covered by my policy?",
+            "Are pre-existing conditions excluded?",
+            "What are the policy exclusions?",
+            "Is cosmetic surgery covered?",
+            "Are experimental treatments covered?"
+        ]
+    },
+    {
+        "category": "Policy Details",
+        "questions": [
+            "When does my policy expire?",
+            "What is my policy number?",
+            "How do I update my policy information?",
+            "What are the renewal terms?",
+            "Can I cancel my policy?"
+        ]
+    }
+]
+
+_SUGGESTIONS_BYTES = orjson.dumps({
+    "suggestions": _SUGGESTIONS,
+    "total_categories": len(_SUGGESTIONS),
+    "total_questions": sum(len(cat["questions"]) for cat in _SUGGESTIONS)
+})
+
 
-@router.post("/queries/ask", response_model=QueryResponse)
+@router.post(
+    "/queries/ask",
+    response_model=QueryResponse,
+    dependencies=[Depends(query_rate_limit)]
+)
 async def ask_policy_question(request: QueryRequest) -> Dict[str, Any]:
     """
     Ask a question about insurance policy documents
@@ -45,6 +104,39 @@ async def ask_policy_question(request: QueryRequest) -> Dict[str, Any]:
         )
 
 
+@router.post(
+    "/queries/ask/stream",
+    dependencies=[Depends(query_rate_limit)]
+)
+async def ask_policy_question_stream(request: QueryRequest) -> StreamingResponse:
+    """
+    Ask a question and stream the answer as server-sent events
+
+    Relevant clauses arrive as the first event (they come from retrieval,
+    before the LLM runs); the answer then streams in 'chunk' events as it
+    is generated, so clients can render text long before the full answer
+    is complete.
+
+    - **query**: Your question about the policy in natural language
+    - **document_id**: Optional - search within a specific document
+    """
+
+    if not request.query.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="Query cannot be empty"
+        )
+
+    async def event_stream():
+        async for event in ai_service.answer_policy_question_stream(
+            query=request.query,
+            document_id=request.document_id
+        ):
+            yield b"data: " + orjson.dumps(event) + b"\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.post("/queries/search")
 async def semantic_search(request: QueryRequest, top_k: int = 5) -> Dict[str, Any]:
     """
@@ -71,10 +163,10 @@ async def semantic_search(request: QueryRequest, top_k: int = 5) -> Dict[str, An
         )
     
     try:
-        from ..services.vector_store import vector_store
+        from ..services.vector_store import get_vector_store
         
         # Perform semantic search
-        results = await vector_store.semantic_search(
+        results = await get_vector_store().semantic_search(
             query=request.query,
             document_id=request.document_id,
             top_k=top_k,
@@ -96,58 +188,10 @@ async def semantic_search(request: QueryRequest, top_k: int = 5) -> Dict[str, An
 
 
 @router.get("/queries/suggestions")
-async def get_query_suggestions() -> Dict[str, Any]:
+async def get_query_suggestions() -> Response:
     """
     Get suggested questions that users commonly ask about insurance policies
     
     Helpful for guiding users on what types of questions they can ask.
     """
-    
-    suggestions = [
-        {
-            "category": "Coverage",
-            "questions": [
-                "What is covered under my health insurance policy?",
-                "Is emergency room treatment covered?",
-                "What is my deductible amount?",
-                "Are prescription medications covered?",
-                "What is the coverage limit for dental procedures?"
-            ]
-        },
-        {
-            "category": "Claims",
-            "questions": [
-                "How do I file a claim?",
-                "What documents are needed for a claim?",
-                "How long does claim processing take?",
-                "What is the claim approval process?",
-                "Can I appeal a denied claim?"
-            ]
-        },
-        {
-            "category": "Exclusions",
-            "questions": [
-                "What is not covered by my policy?",
-                "Are pre-existing conditions excluded?",
-                "What are the policy exclusions?",
-                "Is cosmetic surgery covered?",
-                "Are experimental treatments covered?"
-            ]
-        },
-        {
-            "category": "Policy Details",
-            "questions": [
-                "When does my policy expire?",
-                "What is my policy number?",
-                "How do I update my policy information?",
-                "What are the renewal terms?",
-                "Can I cancel my policy?"
-            ]
-        }
-    ]
-    
-    return {
-        "suggestions": suggestions,
-        "total_categories": len(suggestions),
-        "total_questions": sum(len(cat["questions"]) for cat in suggestions)
-    }
\ No newline at end of file
+    return Response(content=_SUGGESTIONS_BYTES, media_type="application/json")
\ No newline at end of file
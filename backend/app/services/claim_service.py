@@ -2,42 +2,178 @@
 Claim Decision Service with Fraud Detection
 Handles insurance claim processing, decision making, and fraud detection
 """
+import asyncio
+import functools
+import re
+import threading
 import uuid
+from collections import defaultdict
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-from sklearn.feature_extraction.text import TfidfVectorizer
-import pickle
-import os
 
 from ..config import get_settings
 from .ai_service import ai_service
 
 settings = get_settings()
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# Numeric fraud rules, one bit per rule. The kernel fuses every branchy
+# comparison into a single pass over the batch; with numba available it
+# compiles to machine code (cached on disk, parallel over claims), and
+# without it an equivalent NumPy bitmask expression runs instead.
+_RULE_LABELS = (
+    'Very high claim amount',
+    'High claim amount',
+    'Claim submitted same day as incident',
+    'Claim submitted more than 1 year after incident',
+    'Very brief description',
+    'Unusually detailed description',
+    'Weekend claim submission',
+    'Off-hours claim submission',
+    'Round number claim amount',
+)
+
+
+def _rule_bits_numpy(amounts, days, desc_lengths, weekend_flag, offhours_flag):
+    """Vectorized fallback: per-claim rule-hit bitmasks via NumPy"""
+    n = amounts.shape[0]
+    bits = np.zeros(n, dtype=np.int32)
+    bits |= (amounts > 50000) * 1
+    bits |= ((amounts > 20000) & (amounts <= 50000)) * 2
+    bits |= (days == 0) * 4
+    bits |= (days > 365) * 8
+    bits |= (desc_lengths < 20) * 16
+    bits |= (desc_lengths > 1000) * 32
+    if weekend_flag:
+        bits |= 64
+    if offhours_flag:
+        bits |= 128
+    bits |= ((amounts > 0) & (amounts % 1000 == 0)) * 256
+    return bits
+
+
+if njit is not None:
+    @njit(cache=True, fastmath=True, parallel=True)
+    def _rule_bits(amounts, days, desc_lengths, weekend_flag, offhours_flag):
+        n = amounts.shape[0]
+        bits = np.zeros(n, dtype=np.int32)
+        for i in prange(n):
+            b = 0
+            if amounts[i] > 50000:
+                b |= 1
+            elif amounts[i] > 20000:
+                b |= 2
+            if days[i] == 0:
+                b |= 4
+            if days[i] > 365:
+                b |= 8
+            if desc_lengths[i] < 20:
+                b |= 16
+            elif desc_lengths[i] > 1000:
+                b |= 32
+            if weekend_flag:
+                b |= 64
+            if offhours_flag:
+                b |= 128
+            if amounts[i] > 0 and amounts[i] % 1000 == 0:
+                b |= 256
+            bits[i] = b
+        return bits
+
+    # Warm the JIT at import so the one-off compile (cached across runs)
+    # never lands on a live request
+    _rule_bits(
+        np.zeros(1), np.zeros(1), np.zeros(1, dtype=np.int64), False, False
+    )
+else:
+    _rule_bits = _rule_bits_numpy
+
 
 class FraudDetector:
     """Machine learning based fraud detection for insurance claims"""
     
     def __init__(self):
-        self.isolation_forest = IsolationForest(
-            contamination=0.1,  # Assume 10% of claims might be fraudulent
-            random_state=42,
-            n_estimators=100
-        )
-        self.scaler = StandardScaler()
-        self.text_vectorizer = TfidfVectorizer(max_features=100, stop_words='english')
         self.is_trained = False
         self.feature_columns = [
             'amount', 'description_length', 'days_since_incident',
             'claim_hour', 'weekend_claim', 'amount_zscore'
         ]
+
+        # PCG64 generator instead of the lock-guarded legacy global RNG;
+        # single-claim calls draw from a preallocated buffer so the hot
+        # path costs an index bump, not an allocation
+        self._rng = np.random.default_rng(42)
+        self._noise_lock = threading.Lock()
+        self._noise_buf = self._rng.uniform(-0.1, 0.1, size=4096)
+        self._noise_idx = 0
+
+    @functools.cached_property
+    def _ml_models(self) -> Dict[str, Any]:
+        """Lazily construct the sklearn components for model training
+
+        The live scoring path is rule-based and never touches these, so
+        importing sklearn (hundreds of milliseconds and ~100MB resident
+        per worker) is deferred until training is actually requested.
+        """
+        from sklearn.ensemble import IsolationForest
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        return {
+            'isolation_forest': IsolationForest(
+                contamination=0.1,  # Assume 10% of claims might be fraudulent
+                random_state=42,
+                n_estimators=100
+            ),
+            'scaler': StandardScaler(),
+            'text_vectorizer': TfidfVectorizer(max_features=100, stop_words='english'),
+        }
+
+    def _noise(self, n: int) -> np.ndarray:
+        """Model-variability noise; disabled via settings for determinism"""
+        if not settings.fraud_score_noise:
+            return np.zeros(n)
+        if n > len(self._noise_buf):
+            return self._rng.uniform(-0.1, 0.1, size=n)
+        with self._noise_lock:
+            if self._noise_idx + n > len(self._noise_buf):
+                self._noise_buf = self._rng.uniform(-0.1, 0.1, size=4096)
+                self._noise_idx = 0
+            noise = self._noise_buf[self._noise_idx:self._noise_idx + n]
+            self._noise_idx += n
+            return noise
     
-    def extract_features(self, claim_data: Dict[str, Any]) -> Dict[str, float]:
-        """Extract numerical features from claim data for fraud detection"""
+    # Risk labels indexed by np.digitize over the score thresholds
+    RISK_LEVELS = ('VERY_LOW', 'LOW', 'MEDIUM', 'HIGH', 'VERY_HIGH')
+    RISK_THRESHOLDS = np.array([0.2, 0.4, 0.6, 0.8])
+
+    SUSPICIOUS_KEYWORDS = [
+        'total loss', 'completely destroyed', 'no witnesses', 'dark road', 'no camera'
+    ]
+    # One compiled alternation finds every suspicious phrase in a single
+    # pass over the description instead of one substring scan per phrase;
+    # IGNORECASE folds case in the matcher itself, so no lowered copy of
+    # the description is ever allocated
+    SUSPICIOUS_RE = re.compile(
+        "|".join(map(re.escape, SUSPICIOUS_KEYWORDS)), re.IGNORECASE
+    )
+
+    def extract_features(
+        self,
+        claim_data: Dict[str, Any],
+        now: Optional[datetime] = None
+    ) -> Dict[str, float]:
+        """Extract numerical features from claim data for fraud detection
+
+        All time-derived features are computed from a single timestamp,
+        passed in by callers that already captured one.
+        """
+        now = now or datetime.now()
         features = {}
         
         # Basic amount features
@@ -50,9 +186,9 @@ class FraudDetector:
         
         # Time-based features
         try:
-            incident_date = datetime.fromisoformat(claim_data.get('incident_date', str(datetime.now().date())))
-            claim_date = datetime.now()
-            
+            incident_date = datetime.fromisoformat(claim_data.get('incident_date', str(now.date())))
+            claim_date = now
+
             # Days between incident and claim
             days_diff = (claim_date - incident_date).days
             features['days_since_incident'] = max(0, days_diff)
@@ -81,42 +217,23 @@ class FraudDetector:
         
         return features
     
-    def detect_fraud(self, claim_data: Dict[str, Any]) -> Dict[str, Any]:
+    def detect_fraud(
+        self,
+        claim_data: Dict[str, Any],
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
         """
         Detect potential fraud in a claim
-        
+
         Args:
             claim_data: Dictionary containing claim information
-            
+            now: Optional shared timestamp for time-derived features
+
         Returns:
             Dictionary with fraud score and analysis
         """
         try:
-            # Extract features
-            features = self.extract_features(claim_data)
-            
-            # Create feature vector
-            feature_vector = np.array([[features[col] for col in self.feature_columns]])
-            
-            # Simple rule-based fraud indicators
-            fraud_indicators = self._rule_based_fraud_check(claim_data, features)
-            
-            # If we had training data, we would use ML model here
-            # For now, use rule-based scoring
-            base_score = len(fraud_indicators) / 10.0  # Normalize to 0-1
-            
-            # Add randomness to simulate ML model variability
-            ml_adjustment = np.random.uniform(-0.1, 0.1)
-            fraud_score = np.clip(base_score + ml_adjustment, 0.0, 1.0)
-            
-            return {
-                'fraud_score': round(fraud_score, 4),
-                'risk_level': self._categorize_risk(fraud_score),
-                'fraud_indicators': fraud_indicators,
-                'feature_analysis': features,
-                'model_version': '1.0_rule_based'
-            }
-            
+            return self.detect_fraud_batch([claim_data], now=now)[0]
         except Exception as e:
             return {
                 'fraud_score': 0.0,
@@ -125,51 +242,97 @@ class FraudDetector:
                 'feature_analysis': {},
                 'model_version': 'error'
             }
-    
-    def _rule_based_fraud_check(self, claim_data: Dict[str, Any], features: Dict[str, float]) -> List[str]:
-        """Apply rule-based fraud detection"""
-        indicators = []
-        
-        amount = features['amount']
-        description = claim_data.get('description', '').lower()
-        
-        # High amount claims
-        if amount > 50000:
-            indicators.append('Very high claim amount')
-        elif amount > 20000:
-            indicators.append('High claim amount')
-        
-        # Very quick claim submission
-        if features['days_since_incident'] == 0:
-            indicators.append('Claim submitted same day as incident')
-        
-        # Very delayed claim submission
-        if features['days_since_incident'] > 365:
-            indicators.append('Claim submitted more than 1 year after incident')
-        
-        # Suspicious description patterns
-        suspicious_keywords = ['total loss', 'completely destroyed', 'no witnesses', 'dark road', 'no camera']
-        for keyword in suspicious_keywords:
-            if keyword in description:
-                indicators.append(f'Suspicious keyword: {keyword}')
-        
-        # Very short or very long descriptions
-        if features['description_length'] < 20:
-            indicators.append('Very brief description')
-        elif features['description_length'] > 1000:
-            indicators.append('Unusually detailed description')
-        
-        # Weekend or late night claims (slightly suspicious)
-        if features['weekend_claim'] == 1:
-            indicators.append('Weekend claim submission')
-        if features['claim_hour'] < 6 or features['claim_hour'] > 22:
-            indicators.append('Off-hours claim submission')
-        
-        # Round number amounts (psychological bias)
-        if amount > 0 and amount % 1000 == 0:
-            indicators.append('Round number claim amount')
-        
-        return indicators
+
+    def detect_fraud_batch(
+        self,
+        claims: List[Dict[str, Any]],
+        now: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Score a batch of claims in one vectorized pass
+
+        Columns are pulled out of the claim dicts into contiguous NumPy
+        arrays (structure-of-arrays), every numeric rule becomes a boolean
+        mask over the whole batch, and only the keyword scan stays in
+        Python. The per-claim path is this with n=1; bulk rescoring gets
+        the full SIMD win.
+        """
+        n = len(claims)
+        if n == 0:
+            return []
+
+        # One wall-clock read serves the whole batch
+        now = now or datetime.now()
+
+        # Column extraction: one pass over the batch
+        amounts = np.array([float(c.get('amount', 0)) for c in claims])
+        descriptions = [c.get('description', '') for c in claims]
+        desc_lengths = np.array([len(d) for d in descriptions])
+
+        days = np.zeros(n)
+        for i, claim in enumerate(claims):
+            try:
+                incident_date = datetime.fromisoformat(
+                    claim.get('incident_date', str(now.date()))
+                )
+                days[i] = max(0, (now - incident_date).days)
+            except Exception:
+                days[i] = 0
+
+        # Submission-time features are shared by the whole batch
+        claim_hour = now.hour
+        weekend_claim = 1 if now.weekday() >= 5 else 0
+
+        amount_zscore = np.select(
+            [amounts > 10000, amounts > 5000, amounts < 100],
+            [2.0, 1.0, -1.0],
+            default=0.0
+        )
+
+        # Numeric rules run in the fused kernel (numba-compiled when
+        # available); each claim comes back as a rule-hit bitmask
+        rule_bits = _rule_bits(
+            amounts, days, desc_lengths,
+            bool(weekend_claim), claim_hour < 6 or claim_hour > 22
+        )
+
+        indicator_lists: List[List[str]] = [
+            [label for bit, label in enumerate(_RULE_LABELS) if bits & (1 << bit)]
+            for bits in rule_bits
+        ]
+        counts = np.array([int(bits).bit_count() for bits in rule_bits], dtype=np.float64)
+
+        # Keyword scan: one case-insensitive regex pass per description
+        # finds all phrases at once, with no intermediate lowered copy
+        for i, description in enumerate(descriptions):
+            for keyword in dict.fromkeys(
+                match.lower() for match in self.SUSPICIOUS_RE.findall(description)
+            ):
+                indicator_lists[i].append(f'Suspicious keyword: {keyword}')
+                counts[i] += 1
+
+        # Add randomness to simulate ML model variability
+        ml_adjustment = self._noise(n)
+        fraud_scores = np.clip(counts / 10.0 + ml_adjustment, 0.0, 1.0)
+        risk_indices = np.digitize(fraud_scores, self.RISK_THRESHOLDS)
+
+        return [
+            {
+                'fraud_score': round(float(fraud_scores[i]), 4),
+                'risk_level': self.RISK_LEVELS[risk_indices[i]],
+                'fraud_indicators': indicator_lists[i],
+                'feature_analysis': {
+                    'amount': float(amounts[i]),
+                    'description_length': int(desc_lengths[i]),
+                    'days_since_incident': int(days[i]),
+                    'claim_hour': claim_hour,
+                    'weekend_claim': weekend_claim,
+                    'amount_zscore': float(amount_zscore[i])
+                },
+                'model_version': '1.0_rule_based'
+            }
+            for i in range(n)
+        ]
     
     def _categorize_risk(self, fraud_score: float) -> str:
         """Categorize fraud risk based on score"""
@@ -207,48 +370,31 @@ class ClaimDecisionService:
             Dictionary with claim decision, explanation, and analysis
         """
         claim_id = str(uuid.uuid4())
-        
+        # Single timestamp for the whole operation: fraud features and the
+        # processed_at fields all read the clock captured here
+        now = datetime.now()
+
         try:
-            # Step 1: Fraud Detection
-            fraud_analysis = self.fraud_detector.detect_fraud(claim_data)
-            
-            # Step 2: AI Policy Analysis
-            eligibility_analysis = await ai_service.analyze_claim_eligibility(
-                claim_data, document_id
-            )
-            
-            # Step 3: Make final decision
-            final_decision = self._make_final_decision(
-                eligibility_analysis,
-                fraud_analysis,
-                claim_data
+            # Step 1: fraud detection — millisecond-scale rule evaluation
+            fraud_analysis = await asyncio.to_thread(
+                self.fraud_detector.detect_fraud, claim_data, now
             )
-            
-            # Step 4: Generate explanation
-            explanation = self._generate_explanation(
-                final_decision['decision'],
-                eligibility_analysis,
-                fraud_analysis,
-                claim_data
+
+            # Step 2: AI policy analysis, skipped entirely when the fraud
+            # score alone already forces a denial — the RAG retrieval and
+            # Gemini call are the dominant latency and cost of a claim
+            if self._fraud_overrides_decision(fraud_analysis):
+                eligibility_analysis = self._skipped_eligibility()
+            else:
+                eligibility_analysis = await ai_service.analyze_claim_eligibility(
+                    claim_data, document_id
+                )
+
+            # Steps 3 + 4: final decision, explanation, result assembly
+            return self._finalize_claim(
+                claim_id, claim_data, fraud_analysis, eligibility_analysis, now=now
             )
-            
-            return {
-                'claim_id': claim_id,
-                'decision': final_decision['decision'],
-                'explanation': explanation,
-                'fraud_score': fraud_analysis['fraud_score'],
-                'fraud_risk_level': fraud_analysis['risk_level'],
-                'fraud_indicators': fraud_analysis['fraud_indicators'],
-                'policy_references': eligibility_analysis.get('policy_references', []),
-                'ai_confidence': eligibility_analysis.get('confidence_score', 0.5),
-                'processing_details': {
-                    'eligibility_decision': eligibility_analysis.get('decision', 'UNKNOWN'),
-                    'fraud_analysis_version': fraud_analysis.get('model_version', 'unknown'),
-                    'processed_at': datetime.now().isoformat(),
-                    'feature_analysis': fraud_analysis.get('feature_analysis', {})
-                }
-            }
-            
+
         except Exception as e:
             return {
                 'claim_id': claim_id,
@@ -261,10 +407,135 @@ class ClaimDecisionService:
                 'ai_confidence': 0.0,
                 'processing_details': {
                     'error': str(e),
-                    'processed_at': datetime.now().isoformat()
+                    'processed_at': now.isoformat()
                 }
             }
-    
+
+    @staticmethod
+    def _fraud_overrides_decision(fraud_analysis: Dict[str, Any]) -> bool:
+        """True when fraud alone forces a denial in _make_final_decision"""
+        return (
+            fraud_analysis.get('fraud_score', 0.0) >= 0.8
+            or fraud_analysis.get('risk_level') == 'VERY_HIGH'
+        )
+
+    @staticmethod
+    def _skipped_eligibility() -> Dict[str, Any]:
+        """Placeholder analysis for claims denied on fraud score alone"""
+        return {
+            'decision': 'SKIPPED',
+            'explanation': '',
+            'confidence_score': 0.0,
+            'policy_references': []
+        }
+
+    def _finalize_claim(
+        self,
+        claim_id: str,
+        claim_data: Dict[str, Any],
+        fraud_analysis: Dict[str, Any],
+        eligibility_analysis: Dict[str, Any],
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Combine fraud and eligibility analyses into the claim result"""
+        final_decision = self._make_final_decision(
+            eligibility_analysis,
+            fraud_analysis,
+            claim_data
+        )
+
+        explanation = self._generate_explanation(
+            final_decision['decision'],
+            eligibility_analysis,
+            fraud_analysis,
+            claim_data
+        )
+
+        return {
+            'claim_id': claim_id,
+            'decision': final_decision['decision'],
+            'explanation': explanation,
+            'fraud_score': fraud_analysis['fraud_score'],
+            'fraud_risk_level': fraud_analysis['risk_level'],
+            'fraud_indicators': fraud_analysis['fraud_indicators'],
+            'policy_references': eligibility_analysis.get('policy_references', []),
+            'ai_confidence': eligibility_analysis.get('confidence_score', 0.5),
+            'processing_details': {
+                'eligibility_decision': eligibility_analysis.get('decision', 'UNKNOWN'),
+                'fraud_analysis_version': fraud_analysis.get('model_version', 'unknown'),
+                'processed_at': (now or datetime.now()).isoformat(),
+                'feature_analysis': fraud_analysis.get('feature_analysis', {})
+            }
+        }
+
+    async def process_claims_batch(
+        self,
+        claims: List[Dict[str, Any]],
+        document_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Process a batch of claims, sharing retrieval across similar claims
+
+        Fraud detection runs once over the whole batch in its vectorized
+        path. For eligibility, claims are grouped by claim type; each
+        group's policy context is retrieved once and reused by all of the
+        group's LLM analyses, so N claims spanning K types cost K
+        retrievals instead of N. The next group's retrieval is issued
+        while the current group's LLM calls are in flight.
+        """
+        if not claims:
+            return []
+
+        now = datetime.now()
+        fraud_analyses = await asyncio.to_thread(
+            self.fraud_detector.detect_fraud_batch, claims, now
+        )
+
+        groups: Dict[Any, List[int]] = defaultdict(list)
+        for i, claim_data in enumerate(claims):
+            groups[claim_data.get('claim_type')].append(i)
+        ordered_groups = list(groups.values())
+
+        def _retrieve(indices: List[int]) -> asyncio.Task:
+            query = ai_service._create_eligibility_query(claims[indices[0]])
+            return asyncio.ensure_future(
+                ai_service._retrieve_eligibility_context(query, document_id)
+            )
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(claims)
+        retrieval = _retrieve(ordered_groups[0])
+
+        for g, indices in enumerate(ordered_groups):
+            try:
+                context, relevant_chunks = await retrieval
+            except Exception:
+                context, relevant_chunks = '', []
+
+            # Prefetch the next group's context while this group's LLM
+            # analyses are running
+            if g + 1 < len(ordered_groups):
+                retrieval = _retrieve(ordered_groups[g + 1])
+
+            # Claims denied on fraud score alone skip their LLM analysis
+            llm_indices = [
+                i for i in indices
+                if not self._fraud_overrides_decision(fraud_analyses[i])
+            ]
+            analyses = dict(zip(llm_indices, await asyncio.gather(*[
+                ai_service.analyze_claim_with_context(
+                    claims[i], context, relevant_chunks
+                )
+                for i in llm_indices
+            ])))
+
+            for i in indices:
+                results[i] = self._finalize_claim(
+                    str(uuid.uuid4()), claims[i], fraud_analyses[i],
+                    analyses.get(i) or self._skipped_eligibility(), now=now
+                )
+
+        return results
+
     def _make_final_decision(
         self,
         eligibility_analysis: Dict[str, Any],
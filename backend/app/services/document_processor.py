@@ -2,42 +2,143 @@
 Document Processing Service
 Handles PDF and Word document text extraction and processing
 """
+import io
 import os
+import re
 import uuid
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import BinaryIO, List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 import asyncio
 import time
 
-import PyPDF2
 import pdfplumber
+from pdfminer.pdfdocument import PDFPasswordIncorrect
 from docx import Document
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document as LangChainDocument
+
+# The pinned PyMuPDF (1.23.x) only ships the fitz module name; the
+# pymupdf top-level alias arrived in 1.24
+try:
+    import fitz as pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    import tiktoken
+    _token_encoder = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _token_encoder = None
 
 from ..config import get_settings
 
 settings = get_settings()
 
 
+def _token_length(text: str) -> int:
+    """Chunk length in tokens, matching the embedder's real capacity"""
+    return len(_token_encoder.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=256)
+def _re(pattern: str, flags: int = 0) -> re.Pattern:
+    """Compile a regex through a module-owned LRU cache
+
+    Any dynamic pattern in this module goes through here rather than the
+    bare re.* functions: the interpreter-wide re._cache is flushed
+    wholesale by re.purge() and by churn from other libraries, while this
+    cache is stable and inspectable via _re.cache_info().
+    """
+    return re.compile(pattern, flags)
+
+
+def _iter_docx_blocks(doc):
+    """Yield paragraphs and tables in document order with one XML walk
+
+    python-docx exposes paragraphs and tables as separate collections,
+    which forces two traversals and loses their interleaving; iterating
+    the body element directly preserves order in a single pass.
+    """
+    for child in doc.element.body.iterchildren():
+        if child.tag == qn('w:p'):
+            yield Paragraph(child, doc)
+        elif child.tag == qn('w:tbl'):
+            yield Table(child, doc)
+
+
+# Supported upload extensions; a frozenset makes the per-upload
+# validation an O(1) hash probe instead of a list scan
+_SUPPORTED_FILE_TYPES = frozenset({'.pdf', '.docx', '.doc'})
+
+# Metadata fields (policy number, dates, deductible) live in the opening
+# pages of a policy; scanning more than this is wasted linear passes
+_METADATA_SCAN_CHARS = 50_000
+
+# Metadata field patterns: each field's variants form one alternation,
+# and all fields fold into a single compiled pattern so extraction is one
+# finditer pass over the text instead of one full scan per field. The
+# field a match belongs to comes back via match.lastgroup.
+_RAW_PATTERNS = {
+    'policy_number': (
+        r'Policy\s+Number:?\s*(\w+)'
+        r'|Policy\s+No\.?:?\s*(\w+)'
+        r'|Certificate\s+Number:?\s*(\w+)'
+    ),
+    'effective_date': (
+        r'Effective\s+Date:?\s*(\d{1,2}/\d{1,2}/\d{4})'
+        r'|Policy\s+Period:?\s*(\d{1,2}/\d{1,2}/\d{4})'
+    ),
+    'expiration_date': (
+        r'Expiration\s+Date:?\s*(\d{1,2}/\d{1,2}/\d{4})'
+        r'|Expires?:?\s*(\d{1,2}/\d{1,2}/\d{4})'
+    ),
+    'deductible': (
+        r'Deductible:?\s*\$?(\d+(?:,\d{3})*(?:\.\d{2})?)'
+        r'|Annual\s+Deductible:?\s*\$?(\d+(?:,\d{3})*(?:\.\d{2})?)'
+    ),
+}
+
+_ALL_FIELDS_RE = _re(
+    "|".join(f"(?P<{name}>{alts})" for name, alts in _RAW_PATTERNS.items()),
+    re.IGNORECASE
+)
+
+
 class DocumentProcessor:
     """Service for processing insurance policy documents"""
     
     def __init__(self):
         self.upload_dir = Path(settings.upload_dir)
         self.upload_dir.mkdir(exist_ok=True)
-        
+
+        # Chunk budgets are measured in tokens when tiktoken is available
+        # — character counts routinely over- or under-shoot the embedding
+        # model's window, truncating long chunks or wasting embedding
+        # calls on short ones. Without tiktoken the character budgets
+        # apply as before.
+        if _token_encoder is not None:
+            self._length_function = _token_length
+            self._chunk_size = settings.token_chunk_size
+            chunk_overlap = settings.token_chunk_overlap
+        else:
+            self._length_function = len
+            self._chunk_size = settings.chunk_size
+            chunk_overlap = settings.chunk_overlap
+
         # Initialize text splitter for chunking
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.chunk_size,
-            chunk_overlap=settings.chunk_overlap,
-            length_function=len,
+            chunk_size=self._chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=self._length_function,
             separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
         )
     
     async def process_document(
         self, 
-        file_content: bytes, 
+        file_content: Union[bytes, BinaryIO], 
         filename: str, 
         policy_type: Optional[str] = None
     ) -> Dict[str, Any]:
@@ -45,7 +146,7 @@ class DocumentProcessor:
         Process an uploaded document and extract text
         
         Args:
-            file_content: Raw file bytes
+            file_content: Raw file bytes or an open binary file-like object
             filename: Original filename
             policy_type: Type of insurance policy
             
@@ -53,172 +154,272 @@ class DocumentProcessor:
             Dictionary with processing results
         """
         start_time = time.time()
-        
+
         # Generate unique document ID
         doc_id = str(uuid.uuid4())
-        
-        # Get file extension
-        file_extension = Path(filename).suffix.lower()
-        
-        # Save file temporarily
-        temp_file_path = self.upload_dir / f"{doc_id}{file_extension}"
-        with open(temp_file_path, "wb") as f:
-            f.write(file_content)
-        
-        try:
-            # Extract text based on file type
-            if file_extension == '.pdf':
-                text_content = await self._extract_pdf_text(temp_file_path)
-                pages_processed = self._get_pdf_page_count(temp_file_path)
-            elif file_extension in ['.docx', '.doc']:
-                text_content = await self._extract_docx_text(temp_file_path)
-                pages_processed = 1  # DOCX doesn't have clear page concept
-            else:
-                raise ValueError(f"Unsupported file type: {file_extension}")
-            
-            # Split text into chunks
+
+        # Get file extension — os.path.splitext skips the Path object
+        # allocation Path(...).suffix pays on every upload
+        file_extension = os.path.splitext(filename)[1].lower()
+
+        # Parsers consume the upload directly from memory — no temp-file
+        # write/read/unlink round-trip on the critical path. Uploads are
+        # capped at max_file_size, so one in-memory copy is bounded.
+        if not isinstance(file_content, (bytes, bytearray)):
+            file_content.seek(0)
+            file_content = file_content.read()
+
+        # Extract text based on file type. PDFs are chunked page by page
+        # so the full document text is never materialized as one string;
+        # DOCX bodies are modest and keep the simpler whole-text path.
+        if file_extension == '.pdf':
+            pages, pages_processed = await self._extract_pdf_text(file_content)
+            chunks, text_length = self._stream_chunks(pages, doc_id)
+            metadata = await self._extract_metadata(
+                self._metadata_head(pages), policy_type
+            )
+        elif file_extension in ['.docx', '.doc']:
+            text_content = await self._extract_docx_text(file_content)
+            pages_processed = 1  # DOCX doesn't have clear page concept
+            text_length = len(text_content)
             chunks = await self._create_text_chunks(text_content, doc_id)
-            
-            # Extract metadata
             metadata = await self._extract_metadata(text_content, policy_type)
-            
-            processing_time = time.time() - start_time
-            
-            result = {
-                'document_id': doc_id,
-                'filename': filename,
-                'file_type': file_extension,
-                'policy_type': policy_type,
-                'text_length': len(text_content),
-                'pages_processed': pages_processed,
-                'chunks_created': len(chunks),
-                'processing_time': round(processing_time, 2),
-                'metadata': metadata,
-                'chunks': chunks  # This will be stored in vector DB
-            }
-            
-            return result
-            
-        finally:
-            # Clean up temporary file
-            if temp_file_path.exists():
-                temp_file_path.unlink()
+        else:
+            raise ValueError(f"Unsupported file type: {file_extension}")
+
+        processing_time = time.time() - start_time
+
+        return {
+            'document_id': doc_id,
+            'filename': filename,
+            'file_type': file_extension,
+            'policy_type': policy_type,
+            'text_length': text_length,
+            'pages_processed': pages_processed,
+            'chunks_created': len(chunks),
+            'processing_time': round(processing_time, 2),
+            'metadata': metadata,
+            'chunks': chunks  # This will be stored in vector DB
+        }
     
-    async def _extract_pdf_text(self, file_path: Path) -> str:
-        """Extract text from PDF using pdfplumber (better for tables/layout)"""
+    async def _extract_pdf_text(self, file_content: bytes) -> Tuple[List[str], int]:
+        """Extract per-page text and page count from a PDF in one parse
+
+        Returns the pages individually so downstream chunking can stream
+        them instead of joining the whole document into one string. The
+        parse runs on a worker thread so the page loop never blocks the
+        event loop; concurrent uploads therefore extract in parallel.
+        Per-page thread fan-out was deliberately not used — neither
+        backend's page objects are safe to touch from multiple threads,
+        and pdfminer's pure-Python parser would serialize on the GIL
+        anyway.
+        """
+        return await asyncio.to_thread(self._parse_pdf, file_content)
+
+    def _parse_pdf(self, file_content: bytes) -> Tuple[List[str], int]:
+        """Blocking PDF parse: PyMuPDF when installed, else pdfplumber
+
+        PyMuPDF (C extension, an order of magnitude faster and far
+        lighter on memory than pdfminer, reading the stream without an
+        intermediate copy) is the primary path when installed;
+        pdfplumber covers installs without it and the odd layout PyMuPDF
+        fails on. Password-protected documents are rejected up front
+        rather than producing an empty extraction.
+        """
+        if pymupdf is not None:
+            try:
+                with pymupdf.open(stream=file_content, filetype="pdf") as doc:
+                    if doc.needs_pass:
+                        raise PermissionError("PDF is password-protected")
+                    pages = [page.get_text("text") for page in doc]
+                    return [p for p in pages if p], doc.page_count
+            except PermissionError:
+                raise
+            except Exception:
+                pass
+
         text_content = []
-        
         try:
-            with pdfplumber.open(file_path) as pdf:
+            with pdfplumber.open(io.BytesIO(file_content)) as pdf:
+                page_count = len(pdf.pages)
                 for page in pdf.pages:
                     page_text = page.extract_text()
                     if page_text:
                         text_content.append(page_text)
-        except Exception as e:
-            # Fallback to PyPDF2 if pdfplumber fails
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_content.append(page_text)
-        
-        return "\n\n".join(text_content)
-    
-    def _get_pdf_page_count(self, file_path: Path) -> int:
-        """Get the number of pages in a PDF"""
-        try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                return len(pdf_reader.pages)
-        except:
-            return 0
+        except PDFPasswordIncorrect as e:
+            # Mirror the PyMuPDF needs_pass fast-fail so installs without
+            # PyMuPDF also reject locked PDFs instead of extracting nothing
+            raise PermissionError("PDF is password-protected") from e
+
+        return text_content, page_count
     
-    async def _extract_docx_text(self, file_path: Path) -> str:
-        """Extract text from Word document"""
-        doc = Document(file_path)
+    async def _extract_docx_text(self, file_content: bytes) -> str:
+        """Extract text from Word document
+
+        Paragraphs and tables are collected in one walk of the body XML,
+        preserving document order, with each paragraph/cell text pulled
+        from the tree exactly once.
+        """
+        doc = Document(io.BytesIO(file_content))
         text_content = []
-        
-        # Extract text from paragraphs
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                text_content.append(paragraph.text)
-        
-        # Extract text from tables
-        for table in doc.tables:
-            for row in table.rows:
-                row_text = []
-                for cell in row.cells:
-                    if cell.text.strip():
-                        row_text.append(cell.text.strip())
-                if row_text:
-                    text_content.append(" | ".join(row_text))
-        
+
+        for block in _iter_docx_blocks(doc):
+            if isinstance(block, Paragraph):
+                text = block.text
+                if text.strip():
+                    text_content.append(text)
+            else:
+                for row in block.rows:
+                    row_text = [
+                        stripped for cell in row.cells
+                        if (stripped := cell.text.strip())
+                    ]
+                    if row_text:
+                        text_content.append(" | ".join(row_text))
+
         return "\n\n".join(text_content)
     
     async def _create_text_chunks(self, text: str, doc_id: str) -> List[Dict[str, Any]]:
-        """Split text into chunks for vector storage"""
-        documents = [LangChainDocument(page_content=text, metadata={"document_id": doc_id})]
-        chunks = self.text_splitter.split_documents(documents)
-        
-        chunk_data = []
-        for i, chunk in enumerate(chunks):
-            chunk_data.append({
+        """Split text into chunks for vector storage
+
+        Documents that already fit in one chunk skip the splitter
+        entirely; larger ones go through split_text, which avoids the
+        LangChain Document wrapping and metadata propagation that
+        split_documents does on top of the same splitting work.
+        """
+        if self._length_function(text) <= self._chunk_size:
+            pieces = [text]
+        else:
+            pieces = self._merge_tiny_chunks(self.text_splitter.split_text(text))
+
+        return [
+            {
                 'chunk_id': f"{doc_id}_chunk_{i}",
                 'document_id': doc_id,
                 'chunk_index': i,
-                'content': chunk.page_content,
-                'metadata': chunk.metadata
-            })
-        
-        return chunk_data
+                'content': piece,
+                'metadata': {'document_id': doc_id}
+            }
+            for i, piece in enumerate(pieces)
+        ]
     
+    def _stream_chunks(
+        self,
+        pages: List[str],
+        doc_id: str
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Chunk page text incrementally with a rolling buffer
+
+        Pages accumulate in a buffer that is split and flushed as soon as
+        it exceeds the chunk budget, carrying only the final piece forward
+        for continuity into the next page — peak text held is roughly one
+        page plus one chunk, regardless of document size. Returns the
+        chunk dicts and the total extracted text length.
+        """
+        chunks: List[Dict[str, Any]] = []
+
+        def emit(piece: str):
+            chunks.append({
+                'chunk_id': f"{doc_id}_chunk_{len(chunks)}",
+                'document_id': doc_id,
+                'chunk_index': len(chunks),
+                'content': piece,
+                'metadata': {'document_id': doc_id}
+            })
+
+        buffer = ""
+        text_length = 0
+        for page in pages:
+            if not page:
+                continue
+            text_length += len(page) + (2 if buffer or chunks else 0)
+            buffer = f"{buffer}\n\n{page}" if buffer else page
+
+            if self._length_function(buffer) > self._chunk_size:
+                pieces = self._merge_tiny_chunks(self.text_splitter.split_text(buffer))
+                for piece in pieces[:-1]:
+                    emit(piece)
+                buffer = pieces[-1]
+
+        if buffer:
+            if self._length_function(buffer) > self._chunk_size:
+                for piece in self._merge_tiny_chunks(self.text_splitter.split_text(buffer)):
+                    emit(piece)
+            else:
+                emit(buffer)
+
+        return chunks, text_length
+
+    @staticmethod
+    def _metadata_head(pages: List[str]) -> str:
+        """Leading document text for metadata extraction, size-capped"""
+        head_parts: List[str] = []
+        head_len = 0
+        for page in pages:
+            head_parts.append(page)
+            head_len += len(page)
+            if head_len >= _METADATA_SCAN_CHARS:
+                break
+        return "\n\n".join(head_parts)[:_METADATA_SCAN_CHARS]
+
+    def _merge_tiny_chunks(self, pieces: List[str]) -> List[str]:
+        """Second pass over split output: fold context-poor fragments in
+
+        The recursive splitter can emit tiny tail fragments (a stray
+        sentence after a hard separator). Any piece below a fifth of the
+        chunk budget is greedily merged with its predecessor as long as
+        the result stays within 5% of the budget — fewer, fuller chunks
+        mean fewer embeddings downstream and better retrieval context.
+        Lengths use the splitter's unit (tokens when available).
+        """
+        length = self._length_function
+        tiny = self._chunk_size // 5
+        limit = int(self._chunk_size * 1.05)
+
+        merged: List[str] = []
+        for piece in pieces:
+            if (
+                merged
+                and (length(piece) < tiny or length(merged[-1]) < tiny)
+                and length(merged[-1]) + length(piece) + 1 <= limit
+            ):
+                merged[-1] = f"{merged[-1]}\n{piece}"
+            else:
+                merged.append(piece)
+        return merged
+
     async def _extract_metadata(self, text: str, policy_type: Optional[str]) -> Dict[str, Any]:
         """Extract metadata from document text"""
+        extracted_fields: Dict[str, str] = {}
         metadata = {
             'policy_type': policy_type,
-            'extracted_fields': {}
+            'extracted_fields': extracted_fields
         }
-        
-        # Simple pattern matching for common insurance fields
-        patterns = {
-            'policy_number': [
-                r'Policy\s+Number:?\s*(\w+)',
-                r'Policy\s+No\.?:?\s*(\w+)',
-                r'Certificate\s+Number:?\s*(\w+)'
-            ],
-            'effective_date': [
-                r'Effective\s+Date:?\s*(\d{1,2}/\d{1,2}/\d{4})',
-                r'Policy\s+Period:?\s*(\d{1,2}/\d{1,2}/\d{4})'
-            ],
-            'expiration_date': [
-                r'Expiration\s+Date:?\s*(\d{1,2}/\d{1,2}/\d{4})',
-                r'Expires?:?\s*(\d{1,2}/\d{1,2}/\d{4})'
-            ],
-            'deductible': [
-                r'Deductible:?\s*\$?(\d+(?:,\d{3})*(?:\.\d{2})?)',
-                r'Annual\s+Deductible:?\s*\$?(\d+(?:,\d{3})*(?:\.\d{2})?)'
-            ]
-        }
-        
-        import re
-        for field_name, field_patterns in patterns.items():
-            for pattern in field_patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    metadata['extracted_fields'][field_name] = match.group(1)
+
+        # Single scan of the combined pattern: lastgroup names the field
+        # that matched and the innermost (highest-numbered) capture holds
+        # its value. The first hit per field wins, matching the old
+        # per-field search semantics, and the scan stops early once every
+        # field is filled.
+        for match in _ALL_FIELDS_RE.finditer(text):
+            field_name = match.lastgroup
+            if field_name not in extracted_fields:
+                extracted_fields[field_name] = next(
+                    group for group in reversed(match.groups())
+                    if group is not None
+                )
+                if len(extracted_fields) == len(_RAW_PATTERNS):
                     break
-        
+
         return metadata
     
     def get_supported_file_types(self) -> List[str]:
         """Get list of supported file extensions"""
-        return ['.pdf', '.docx', '.doc']
-    
+        return sorted(_SUPPORTED_FILE_TYPES)
+
     def validate_file_type(self, filename: str) -> bool:
         """Check if file type is supported"""
-        file_extension = Path(filename).suffix.lower()
-        return file_extension in self.get_supported_file_types()
+        return os.path.splitext(filename)[1].lower() in _SUPPORTED_FILE_TYPES
     
     def validate_file_size(self, file_size: int) -> bool:
         """Check if file size is within limits"""
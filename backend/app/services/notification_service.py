@@ -2,19 +2,115 @@
 Notification Service
 Handles email and SMS notifications for claim updates and system alerts
 """
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+import logging
 import smtplib
+import threading
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 
+from jinja2 import Environment, BaseLoader
 from twilio.rest import Client as TwilioClient
 from twilio.base.exceptions import TwilioRestException
 
 from ..config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Per-decision presentation for claim emails, built once instead of being
+# re-derived from chained ternaries on every send
+_DECISION_COLOR = {
+    'APPROVED': '#198754',
+    'DENIED': '#dc3545',
+}
+_DEFAULT_DECISION_COLOR = '#ffc107'
+
+_NEXT_STEPS_HTML = {
+    'APPROVED': (
+        '<div style="background: #d1ecf1; padding: 15px; border-radius: 6px; border-left: 4px solid #bee5eb;">'
+        '<p><strong>Next Steps:</strong> Payment processing will begin within 3-5 business days.</p></div>'
+    ),
+    'DENIED': (
+        '<div style="background: #f8d7da; padding: 15px; border-radius: 6px; border-left: 4px solid #f5c6cb;">'
+        '<p><strong>Next Steps:</strong> You may appeal this decision by contacting our customer service.</p></div>'
+    ),
+}
+_DEFAULT_NEXT_STEPS_HTML = (
+    '<div style="background: #fff3cd; padding: 15px; border-radius: 6px; border-left: 4px solid #ffeaa7;">'
+    '<p><strong>Next Steps:</strong> A specialist will review your case within 2 business days.</p></div>'
+)
+
+# Email bodies as Jinja2 templates compiled once at import: each send
+# runs the template's compiled render function instead of re-walking a
+# ~2KB string, and autoescaping covers any claim data that ends up in
+# the HTML. next_steps is our own prebuilt markup, hence the safe filter.
+_template_env = Environment(loader=BaseLoader(), autoescape=True)
+
+_CLAIM_EMAIL_TEMPLATE = _template_env.from_string("""
+        <html>
+        <head></head>
+        <body>
+            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+                <div style="background-color: #f8f9fa; padding: 20px; border-radius: 8px;">
+                    <h2 style="color: #333; margin-bottom: 20px;">Insurance Claim Update</h2>
+
+                    <div style="background: white; padding: 20px; border-radius: 6px; margin-bottom: 20px;">
+                        <h3 style="color: #0d6efd; margin-bottom: 15px;">Claim Details</h3>
+                        <p><strong>Claim ID:</strong> {{ claim_id }}</p>
+                        <p><strong>Amount:</strong> ${{ amount }}</p>
+                        <p><strong>Decision:</strong> <span style="color: {{ decision_color }}; font-weight: bold;">{{ decision }}</span></p>
+                        <p><strong>Date:</strong> {{ date }}</p>
+                    </div>
+
+                    <div style="background: white; padding: 20px; border-radius: 6px; margin-bottom: 20px;">
+                        <h3 style="color: #0d6efd; margin-bottom: 15px;">Explanation</h3>
+                        <p>{{ explanation }}</p>
+                    </div>
+
+                    {{ next_steps | safe }}
+
+                    <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #dee2e6; color: #6c757d; font-size: 12px;">
+                        <p>This is an automated message from your Insurance AI Assistant. Please do not reply to this email.</p>
+                    </div>
+                </div>
+            </div>
+        </body>
+        </html>
+        """)
+
+_DOCUMENT_EMAIL_TEMPLATE = _template_env.from_string("""
+        <html>
+        <head></head>
+        <body>
+            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+                <div style="background-color: #f8f9fa; padding: 20px; border-radius: 8px;">
+                    <h2 style="color: #333; margin-bottom: 20px;">Document Processing Complete</h2>
+
+                    <div style="background: white; padding: 20px; border-radius: 6px; margin-bottom: 20px;">
+                        <h3 style="color: #0d6efd; margin-bottom: 15px;">Processing Summary</h3>
+                        <p><strong>Document:</strong> {{ filename }}</p>
+                        <p><strong>Document ID:</strong> {{ document_id }}</p>
+                        <p><strong>Pages Processed:</strong> {{ pages_processed }}</p>
+                        <p><strong>Processing Time:</strong> {{ processing_time }} seconds</p>
+                        <p><strong>Status:</strong> <span style="color: #198754; font-weight: bold;">Successfully Processed</span></p>
+                    </div>
+
+                    <div style="background: #d1ecf1; padding: 15px; border-radius: 6px; border-left: 4px solid #bee5eb;">
+                        <p><strong>What's Next:</strong> Your policy document has been analyzed and indexed. You can now ask questions about your policy or submit claims for processing.</p>
+                    </div>
+
+                    <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #dee2e6; color: #6c757d; font-size: 12px;">
+                        <p>This is an automated message from your Insurance AI Assistant.</p>
+                    </div>
+                </div>
+            </div>
+        </body>
+        </html>
+        """)
 
 
 class EmailService:
@@ -25,6 +121,16 @@ class EmailService:
         self.smtp_port = settings.smtp_port
         self.smtp_username = settings.smtp_username
         self.smtp_password = settings.smtp_password
+
+        # One long-lived connection shared by all sends: the TLS + AUTH
+        # handshake is paid once instead of per message. Sends run on
+        # executor threads, so the guard is a thread lock.
+        self._conn: Optional[smtplib.SMTP] = None
+        self._conn_lock = threading.Lock()
+
+        # Dedicated pool so notification bursts can't starve the loop's
+        # default executor (shared with fraud scoring and file parsing)
+        self._pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="smtp")
     
     async def send_email(
         self,
@@ -54,9 +160,9 @@ class EmailService:
             else:
                 msg.attach(MIMEText(body, 'plain'))
             
-            # Send email in a thread to avoid blocking
-            await asyncio.get_event_loop().run_in_executor(
-                None,
+            # Send email on the service's own pool to avoid blocking
+            await asyncio.get_running_loop().run_in_executor(
+                self._pool,
                 self._send_smtp_email,
                 msg
             )
@@ -72,12 +178,41 @@ class EmailService:
                 'error': f'Failed to send email: {str(e)}'
             }
     
+    def _get_conn(self) -> smtplib.SMTP:
+        """Return the shared SMTP connection, reconnecting if it went stale"""
+        if self._conn is not None:
+            try:
+                if self._conn.noop()[0] == 250:
+                    return self._conn
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close_conn()
+
+        conn = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        conn.starttls()
+        conn.login(self.smtp_username, self.smtp_password)
+        self._conn = conn
+        return conn
+
+    def _close_conn(self):
+        """Drop the shared connection so the next send reconnects"""
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
     def _send_smtp_email(self, msg: MIMEMultipart):
-        """Send email using SMTP (blocking operation)"""
-        with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-            server.starttls()
-            server.login(self.smtp_username, self.smtp_password)
-            server.send_message(msg)
+        """Send email over the persistent SMTP connection (blocking operation)"""
+        with self._conn_lock:
+            try:
+                self._get_conn().send_message(msg)
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError):
+                # The server hung up between the liveness check and the
+                # send — reconnect once and retry
+                self._close_conn()
+                self._get_conn().send_message(msg)
     
     async def send_claim_notification(
         self,
@@ -91,45 +226,17 @@ class EmailService:
         amount = claim_data.get('amount', 0)
         
         subject = f"Insurance Claim Update - {claim_id}"
-        
-        # Create HTML email body
-        html_body = f"""
-        <html>
-        <head></head>
-        <body>
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background-color: #f8f9fa; padding: 20px; border-radius: 8px;">
-                    <h2 style="color: #333; margin-bottom: 20px;">Insurance Claim Update</h2>
-                    
-                    <div style="background: white; padding: 20px; border-radius: 6px; margin-bottom: 20px;">
-                        <h3 style="color: #0d6efd; margin-bottom: 15px;">Claim Details</h3>
-                        <p><strong>Claim ID:</strong> {claim_id}</p>
-                        <p><strong>Amount:</strong> ${amount:,.2f}</p>
-                        <p><strong>Decision:</strong> <span style="color: {'#198754' if decision == 'APPROVED' else '#dc3545' if decision == 'DENIED' else '#ffc107'}; font-weight: bold;">{decision}</span></p>
-                        <p><strong>Date:</strong> {datetime.now().strftime('%B %d, %Y at %I:%M %p')}</p>
-                    </div>
-                    
-                    <div style="background: white; padding: 20px; border-radius: 6px; margin-bottom: 20px;">
-                        <h3 style="color: #0d6efd; margin-bottom: 15px;">Explanation</h3>
-                        <p>{claim_data.get('explanation', 'No explanation provided.')}</p>
-                    </div>
-                    
-                    {'<div style="background: #d1ecf1; padding: 15px; border-radius: 6px; border-left: 4px solid #bee5eb;">' +
-                     '<p><strong>Next Steps:</strong> Payment processing will begin within 3-5 business days.</p></div>' if decision == 'APPROVED' else
-                     '<div style="background: #f8d7da; padding: 15px; border-radius: 6px; border-left: 4px solid #f5c6cb;">' +
-                     '<p><strong>Next Steps:</strong> You may appeal this decision by contacting our customer service.</p></div>' if decision == 'DENIED' else
-                     '<div style="background: #fff3cd; padding: 15px; border-radius: 6px; border-left: 4px solid #ffeaa7;">' +
-                     '<p><strong>Next Steps:</strong> A specialist will review your case within 2 business days.</p></div>'}
-                    
-                    <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #dee2e6; color: #6c757d; font-size: 12px;">
-                        <p>This is an automated message from your Insurance AI Assistant. Please do not reply to this email.</p>
-                    </div>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
+
+        html_body = _CLAIM_EMAIL_TEMPLATE.render(
+            claim_id=claim_id,
+            amount=f"{amount:,.2f}",
+            decision=decision,
+            decision_color=_DECISION_COLOR.get(decision, _DEFAULT_DECISION_COLOR),
+            date=datetime.now().strftime('%B %d, %Y at %I:%M %p'),
+            explanation=claim_data.get('explanation', 'No explanation provided.'),
+            next_steps=_NEXT_STEPS_HTML.get(decision, _DEFAULT_NEXT_STEPS_HTML),
+        )
+
         return await self.send_email(to_email, subject, html_body, is_html=True)
     
     async def send_document_processed_notification(
@@ -143,37 +250,14 @@ class EmailService:
         document_id = document_data.get('document_id', 'Unknown')
         
         subject = "Policy Document Processed Successfully"
-        
-        html_body = f"""
-        <html>
-        <head></head>
-        <body>
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background-color: #f8f9fa; padding: 20px; border-radius: 8px;">
-                    <h2 style="color: #333; margin-bottom: 20px;">Document Processing Complete</h2>
-                    
-                    <div style="background: white; padding: 20px; border-radius: 6px; margin-bottom: 20px;">
-                        <h3 style="color: #0d6efd; margin-bottom: 15px;">Processing Summary</h3>
-                        <p><strong>Document:</strong> {filename}</p>
-                        <p><strong>Document ID:</strong> {document_id}</p>
-                        <p><strong>Pages Processed:</strong> {document_data.get('pages_processed', 'N/A')}</p>
-                        <p><strong>Processing Time:</strong> {document_data.get('processing_time', 'N/A')} seconds</p>
-                        <p><strong>Status:</strong> <span style="color: #198754; font-weight: bold;">Successfully Processed</span></p>
-                    </div>
-                    
-                    <div style="background: #d1ecf1; padding: 15px; border-radius: 6px; border-left: 4px solid #bee5eb;">
-                        <p><strong>What's Next:</strong> Your policy document has been analyzed and indexed. You can now ask questions about your policy or submit claims for processing.</p>
-                    </div>
-                    
-                    <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #dee2e6; color: #6c757d; font-size: 12px;">
-                        <p>This is an automated message from your Insurance AI Assistant.</p>
-                    </div>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
+
+        html_body = _DOCUMENT_EMAIL_TEMPLATE.render(
+            filename=filename,
+            document_id=document_id,
+            pages_processed=document_data.get('pages_processed', 'N/A'),
+            processing_time=document_data.get('processing_time', 'N/A'),
+        )
+
         return await self.send_email(to_email, subject, html_body, is_html=True)
 
 
@@ -184,7 +268,15 @@ class SMSService:
         self.account_sid = settings.twilio_account_sid
         self.auth_token = settings.twilio_auth_token
         self.client = None
-        
+
+        # Fetched from Twilio once on first send, then reused — looking
+        # the number up per message cost a full REST round-trip each time
+        self._default_from: Optional[str] = None
+
+        # Dedicated pool for Twilio REST calls, for the same reason as
+        # EmailService: keep outbound bursts off the default executor
+        self._pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="sms")
+
         if self.account_sid and self.auth_token:
             self.client = TwilioClient(self.account_sid, self.auth_token)
     
@@ -203,9 +295,9 @@ class SMSService:
             }
         
         try:
-            # Send SMS in a thread to avoid blocking
-            result = await asyncio.get_event_loop().run_in_executor(
-                None,
+            # Send SMS on the service's own pool to avoid blocking
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._pool,
                 self._send_twilio_sms,
                 to_phone,
                 message,
@@ -230,11 +322,19 @@ class SMSService:
                 'error': f'Failed to send SMS: {str(e)}'
             }
     
+    def _default_from_number(self) -> str:
+        """The account's sending number, fetched lazily and memoized"""
+        if self._default_from is None:
+            self._default_from = (
+                self.client.incoming_phone_numbers.list(limit=1)[0].phone_number
+            )
+        return self._default_from
+
     def _send_twilio_sms(self, to_phone: str, message: str, from_phone: Optional[str]):
         """Send SMS using Twilio (blocking operation)"""
         return self.client.messages.create(
             body=message,
-            from_=from_phone or self.client.api.account.phone_numbers.list()[0].phone_number,
+            from_=from_phone or self._default_from_number(),
             to=to_phone
         )
     
@@ -253,43 +353,56 @@ class SMSService:
         return await self.send_sms(to_phone, message)
 
 
+async def _no_notification() -> None:
+    """Stand-in coroutine for channels without a configured recipient"""
+    return None
+
+
+def _channel_result(result: Any) -> Optional[Dict[str, Any]]:
+    """Normalize a gathered channel outcome into the usual result dict"""
+    if isinstance(result, Exception):
+        return {'success': False, 'error': str(result)}
+    return result
+
+
 class NotificationService:
     """Unified notification service combining email and SMS"""
-    
+
     def __init__(self):
         self.email_service = EmailService()
         self.sms_service = SMSService()
-    
+
     async def notify_claim_decision(
         self,
         claim_data: Dict[str, Any],
         email: Optional[str] = None,
         phone: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Send claim decision notification via email and/or SMS"""
-        
+        """Send claim decision notification via email and/or SMS
+
+        The two channels are independent external calls, so they run
+        concurrently — wall time is the slower of the two rather than
+        their sum.
+        """
+        email_result, sms_result = await asyncio.gather(
+            self.email_service.send_claim_notification(email, claim_data)
+            if email else _no_notification(),
+            self.sms_service.send_claim_alert(phone, claim_data)
+            if phone else _no_notification(),
+            return_exceptions=True
+        )
+
         results = {
-            'email': None,
-            'sms': None,
-            'success': False
+            'email': _channel_result(email_result),
+            'sms': _channel_result(sms_result),
         }
-        
-        # Send email notification
-        if email:
-            email_result = await self.email_service.send_claim_notification(email, claim_data)
-            results['email'] = email_result
-        
-        # Send SMS notification
-        if phone:
-            sms_result = await self.sms_service.send_claim_alert(phone, claim_data)
-            results['sms'] = sms_result
-        
+
         # Consider successful if at least one notification was sent
-        results['success'] = (
+        results['success'] = bool(
             (results['email'] and results['email'].get('success', False)) or
             (results['sms'] and results['sms'].get('success', False))
         )
-        
+
         return results
     
     async def notify_document_processed(
@@ -316,36 +429,71 @@ class NotificationService:
     ) -> Dict[str, Any]:
         """Send system alert notification"""
         
+        subject = f"Insurance AI Assistant Alert - {alert_type.upper()}"
+
+        # Email always goes out when a recipient is set; SMS only for
+        # critical alerts — and the two run concurrently
+        email_result, sms_result = await asyncio.gather(
+            self.email_service.send_email(email, subject, message, is_html=False)
+            if email else _no_notification(),
+            self.sms_service.send_sms(phone, f"ALERT: {message}")
+            if phone and alert_type in ['error', 'critical'] else _no_notification(),
+            return_exceptions=True
+        )
+
         results = {
-            'email': None,
-            'sms': None,
-            'success': False
+            'email': _channel_result(email_result),
+            'sms': _channel_result(sms_result),
         }
-        
-        subject = f"Insurance AI Assistant Alert - {alert_type.upper()}"
-        
-        # Send email alert
-        if email:
-            email_result = await self.email_service.send_email(
-                email,
-                subject,
-                message,
-                is_html=False
-            )
-            results['email'] = email_result
-        
-        # Send SMS alert (if critical)
-        if phone and alert_type in ['error', 'critical']:
-            sms_result = await self.sms_service.send_sms(phone, f"ALERT: {message}")
-            results['sms'] = sms_result
-        
-        results['success'] = (
+
+        results['success'] = bool(
             (results['email'] and results['email'].get('success', False)) or
             (results['sms'] and results['sms'].get('success', False))
         )
-        
+
         return results
     
+    async def notify_batch(
+        self,
+        items: List[Tuple[str, Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """Send a batch of document-processed notifications
+
+        Items are grouped by recipient; a recipient with several documents
+        in the batch gets one digest email instead of one email per upload.
+        """
+        by_recipient: Dict[str, List[Dict[str, Any]]] = {}
+        for email, document_data in items:
+            by_recipient.setdefault(email, []).append(document_data)
+
+        sent = 0
+        for email, documents in by_recipient.items():
+            if len(documents) == 1:
+                result = await self.email_service.send_document_processed_notification(
+                    email, documents[0]
+                )
+            else:
+                lines = [
+                    f"- {doc.get('filename', 'Unknown')} "
+                    f"({doc.get('pages_processed', 'N/A')} pages)"
+                    for doc in documents
+                ]
+                result = await self.email_service.send_email(
+                    email,
+                    f"{len(documents)} Policy Documents Processed",
+                    "The following policy documents were processed successfully:\n\n"
+                    + "\n".join(lines)
+                )
+            if result.get('success'):
+                sent += 1
+
+        return {
+            'success': sent > 0,
+            'batches_sent': sent,
+            'recipients': len(by_recipient),
+            'items': len(items)
+        }
+
     def get_service_status(self) -> Dict[str, Any]:
         """Get status of notification services"""
         return {
@@ -361,5 +509,65 @@ class NotificationService:
         }
 
 
-# Global instance
-notification_service = NotificationService()
\ No newline at end of file
+class NotificationQueue:
+    """Batches upload notifications off the request path
+
+    Uploads enqueue (email, document_data) pairs; the drain task flushes
+    once 100 items accumulate or 60 seconds pass, handing the batch to
+    NotificationService.notify_batch. The backlog is bounded — on overflow
+    the oldest entry is dropped, since notifications are best-effort.
+    """
+
+    def __init__(
+        self,
+        service: NotificationService,
+        max_items: int = 100,
+        max_wait: float = 60.0,
+        max_backlog: int = 1000
+    ):
+        self._service = service
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_backlog)
+        self._max_items = max_items
+        self._max_wait = max_wait
+        self._drain_task: Optional[asyncio.Task] = None
+
+    def enqueue(self, email: str, document_data: Dict[str, Any]):
+        """Queue a document-processed notification for batched delivery"""
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.get_running_loop().create_task(self._drain())
+
+        try:
+            self._queue.put_nowait((email, document_data))
+        except asyncio.QueueFull:
+            try:
+                self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            self._queue.put_nowait((email, document_data))
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+
+            deadline = loop.time() + self._max_wait
+            while len(batch) < self._max_items:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._service.notify_batch(batch)
+            except Exception as e:
+                logger.warning("Batched notification flush failed: %s", e)
+
+
+# Global instances
+notification_service = NotificationService()
+notification_queue = NotificationQueue(notification_service)
\ No newline at end of file
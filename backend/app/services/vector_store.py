@@ -2,11 +2,18 @@
 Vector Database Service
 Handles document embeddings storage and semantic search using ChromaDB
 """
+import concurrent.futures
+import functools
+import hashlib
 import os
 import uuid
+import logging
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional, Tuple
 import asyncio
 
+import torch
+
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
@@ -15,11 +22,158 @@ import numpy as np
 from ..config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """Micro-batches concurrent query embeddings into single encode calls
+
+    Concurrent searches each need one embedding; encoding them one at a
+    time serializes through the executor with the model mostly idle. The
+    drain task collects queries for a few milliseconds and encodes up to
+    max_batch of them in one forward pass, resolving each caller's future.
+    """
+
+    def __init__(self, encode_fn, max_batch: int = 64, max_wait: float = 0.008):
+        self._encode_fn = encode_fn
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+        self._drain_task: Optional[asyncio.Task] = None
+
+    async def submit(self, text: str) -> np.ndarray:
+        """Queue a text for embedding; returns its (1, dim) embedding"""
+        loop = asyncio.get_event_loop()
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = loop.create_task(self._drain())
+
+        future = loop.create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def _drain(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self._queue.get()]
+
+            # Hold the batch open briefly to let concurrent callers join
+            deadline = loop.time() + self._max_wait
+            while len(batch) < self._max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                embeddings = await self._encode_fn([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding[np.newaxis, :])
+
+
+class ChromaQueryBatcher:
+    """Combines concurrent collection queries that share a filter
+
+    Chroma answers a multi-embedding query in one HNSW pass; concurrent
+    searches with the same (document filter, n_results) are drained
+    together, issued as one query off the event loop, and demuxed by
+    index back to each caller's future.
+    """
+
+    def __init__(self, query_fn, max_batch: int = 32, max_wait: float = 0.005):
+        self._query_fn = query_fn
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+        self._drain_task: Optional[asyncio.Task] = None
+
+    async def submit(
+        self,
+        embedding: np.ndarray,
+        where: Optional[Dict[str, Any]],
+        n_results: int
+    ) -> Dict[str, Any]:
+        """Queue one query; returns a single-query Chroma result dict"""
+        loop = asyncio.get_event_loop()
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = loop.create_task(self._drain())
+
+        key = (where.get("document_id") if where else None, n_results)
+        future = loop.create_future()
+        self._queue.put_nowait((key, where, n_results, embedding, future))
+        return await future
+
+    async def _drain(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self._queue.get()]
+
+            deadline = loop.time() + self._max_wait
+            while len(batch) < self._max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            groups: Dict[Any, list] = {}
+            for item in batch:
+                groups.setdefault(item[0], []).append(item)
+
+            for items in groups.values():
+                _, where, n_results, _, _ = items[0]
+                # chromadb 0.4.18 rejects ndarray query_embeddings, so the
+                # stacked batch goes over the boundary as a list of lists
+                embeddings = np.vstack([item[3] for item in items]).tolist()
+                try:
+                    results = await loop.run_in_executor(
+                        None,
+                        functools.partial(
+                            self._query_fn,
+                            query_embeddings=embeddings,
+                            n_results=n_results,
+                            where=where,
+                            include=['documents', 'metadatas', 'distances']
+                        )
+                    )
+                except Exception as e:
+                    for *_, future in items:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+
+                for i, (*_, future) in enumerate(items):
+                    if not future.done():
+                        future.set_result({
+                            'documents': [results['documents'][i]],
+                            'metadatas': [results['metadatas'][i]],
+                            'distances': [results['distances'][i]]
+                        })
 
 
 class VectorStore:
     """Service for managing document embeddings and semantic search"""
-    
+
+    # Scalar-quantization scale for cached query embeddings: vectors are
+    # L2-normalized, so every component fits [-1, 1] and int8 at scale 127
+    # holds them with sub-1% recall impact at a quarter of the memory
+    _QUANT_SCALE = 127.0
+
     def __init__(self):
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
@@ -27,12 +181,57 @@ class VectorStore:
             settings=Settings(anonymized_telemetry=False)
         )
         
-        # Initialize embedding model
+        # Initialize embedding model. FP16 on GPU halves memory traffic per
+        # forward pass; on CPU let torch use every core for the GEMMs
         self.embedding_model = SentenceTransformer(settings.embedding_model)
+        if torch.cuda.is_available():
+            self.embedding_model = self.embedding_model.half().to("cuda")
+        else:
+            torch.set_num_threads(os.cpu_count() or 1)
+
+        # Dedicated single-thread pool for encode calls: keeps the model
+        # off the shared default executor, avoids CPU oversubscription
+        # against torch's own intra-op threads, and keeps one warm thread
+        # with its caches primed for the batcher
+        self._embed_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="embed"
+        )
+
+        # Fixed encode configuration: larger batches amortize kernel launch
+        # overhead, normalized numpy output feeds ChromaDB directly
+        self._encode = functools.partial(
+            self.embedding_model.encode,
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
         
         # Collection for storing document chunks
         self.collection_name = "insurance_documents"
         self.collection = self._get_or_create_collection()
+
+        # LRU cache of query embeddings: repeated questions (canned
+        # suggestions, retried searches) skip the SBERT forward pass
+        self._query_cache: OrderedDict = OrderedDict()
+        self._query_cache_max = 4096
+        self._query_cache_lock = asyncio.Lock()
+
+        # Cache misses go through the batcher so concurrent searches share
+        # one forward pass instead of serializing through the executor
+        self._batcher = EmbeddingBatcher(self._generate_embeddings)
+
+        # Same idea on the retrieval side: concurrent searches with the
+        # same filter share one HNSW pass
+        self._query_batcher = ChromaQueryBatcher(self.collection.query)
+
+        # Known document IDs, populated lazily by one metadata scan and
+        # kept in sync on store/delete so list_documents never rescans
+        self._doc_id_cache: Optional[set] = None
+
+        # Denormalized chunk count: collection.count() is a SQLite
+        # aggregate, too hot for health-check polling
+        self._count = self.collection.count()
     
     def _get_or_create_collection(self):
         """Get existing collection or create new one"""
@@ -41,7 +240,15 @@ class VectorStore:
         except Exception:
             return self.client.create_collection(
                 name=self.collection_name,
-                metadata={"description": "Insurance policy document chunks"}
+                metadata={
+                    "description": "Insurance policy document chunks",
+                    # HNSW tuning: higher construction effort for better
+                    # graph quality, search_ef sized for top_k <= 20
+                    "hnsw:space": "cosine",
+                    "hnsw:construction_ef": 200,
+                    "hnsw:M": 16,
+                    "hnsw:search_ef": 64
+                }
             )
     
     async def store_document_chunks(self, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -57,45 +264,66 @@ class VectorStore:
         if not chunks:
             return {'stored_chunks': 0, 'error': 'No chunks provided'}
         
-        # Prepare data for ChromaDB
-        chunk_ids = []
-        chunk_contents = []
-        chunk_metadatas = []
-        
-        for chunk in chunks:
-            chunk_ids.append(chunk['chunk_id'])
-            chunk_contents.append(chunk['content'])
-            
-            # Prepare metadata (ChromaDB requires string values)
-            metadata = {
+        # Prepare data for ChromaDB (metadata values must be strings)
+        chunk_ids = [chunk['chunk_id'] for chunk in chunks]
+        chunk_contents = [chunk['content'] for chunk in chunks]
+        chunk_metadatas = [
+            {
                 'document_id': chunk['document_id'],
                 'chunk_index': str(chunk['chunk_index']),
-                'content_length': str(len(chunk['content']))
+                'content_length': str(len(chunk['content'])),
+                **{
+                    f"meta_{key}": str(value)
+                    for key, value in (chunk.get('metadata') or {}).items()
+                    if isinstance(value, (str, int, float))
+                }
             }
-            
-            # Add any additional metadata
-            if 'metadata' in chunk and chunk['metadata']:
-                for key, value in chunk['metadata'].items():
-                    if isinstance(value, (str, int, float)):
-                        metadata[f"meta_{key}"] = str(value)
-            
-            chunk_metadatas.append(metadata)
+            for chunk in chunks
+        ]
         
         try:
-            # Generate embeddings
-            embeddings = await self._generate_embeddings(chunk_contents)
+            # Embed each distinct content once — policy boilerplate repeated
+            # across chunks otherwise pays the model per copy — then scatter
+            # the unique embeddings back over the full chunk list
+            unique_index: Dict[bytes, int] = {}
+            unique_contents = []
+            row_of = []
+            for content in chunk_contents:
+                digest = hashlib.blake2b(content.encode(), digest_size=16).digest()
+                idx = unique_index.get(digest)
+                if idx is None:
+                    idx = len(unique_contents)
+                    unique_index[digest] = idx
+                    unique_contents.append(content)
+                row_of.append(idx)
+
+            unique_embeddings = await self._generate_embeddings(unique_contents)
+            embeddings = unique_embeddings[row_of]
             
-            # Store in ChromaDB
-            self.collection.add(
+            # Store in ChromaDB. upsert tolerates re-ingesting a document.
+            # The pinned chromadb (0.4.18) validates embeddings as a list
+            # of lists and rejects ndarrays, so the conversion stays.
+            self.collection.upsert(
                 documents=chunk_contents,
-                embeddings=embeddings.tolist(),
+                embeddings=embeddings.astype(np.float32, copy=False).tolist(),
                 metadatas=chunk_metadatas,
                 ids=chunk_ids
             )
-            
+
+            # Cheap read-back so a silently rejected upsert surfaces as a
+            # storage error instead of an empty corpus discovered at search
+            if not self.collection.get(ids=[chunk_ids[0]], include=[])['ids']:
+                raise RuntimeError(
+                    f"Chunk {chunk_ids[0]} not retrievable after upsert"
+                )
+
+            if self._doc_id_cache is not None:
+                self._doc_id_cache.update(chunk['document_id'] for chunk in chunks)
+            self._count += len(chunk_ids)
+
             return {
                 'stored_chunks': len(chunks),
-                'collection_size': self.collection.count()
+                'collection_size': self._count
             }
             
         except Exception as e:
@@ -124,45 +352,48 @@ class VectorStore:
             List of relevant document chunks with scores
         """
         try:
-            # Generate query embedding
-            query_embedding = await self._generate_embeddings([query])
+            # Generate query embedding (cached for repeated queries)
+            query_embedding = await self._embed_query(query)
             
             # Prepare search filters
             where_clause = {}
             if document_id:
                 where_clause["document_id"] = document_id
             
-            # Search in ChromaDB
-            results = self.collection.query(
-                query_embeddings=query_embedding.tolist(),
-                n_results=top_k,
-                where=where_clause if where_clause else None,
-                include=['documents', 'metadatas', 'distances']
+            # Search in ChromaDB via the query batcher (runs off the
+            # event loop and shares HNSW passes between concurrent calls)
+            results = await self._query_batcher.submit(
+                query_embedding,
+                where_clause if where_clause else None,
+                top_k
             )
             
-            # Process results
+            # Process results: similarity = 1 - distance, computed for the
+            # whole result set in one vectorized pass
             relevant_chunks = []
             if results['documents'] and results['documents'][0]:
-                for i, (doc, metadata, distance) in enumerate(zip(
-                    results['documents'][0],
-                    results['metadatas'][0],
-                    results['distances'][0]
-                )):
-                    # Convert distance to similarity score (lower distance = higher similarity)
-                    similarity_score = max(0, 1 - distance)
-                    
-                    if similarity_score >= min_relevance_score:
-                        relevant_chunks.append({
-                            'content': doc,
-                            'metadata': metadata,
-                            'similarity_score': round(similarity_score, 4),
-                            'rank': i + 1
-                        })
+                sims = np.round(np.clip(
+                    1.0 - np.asarray(results['distances'][0], dtype=np.float32),
+                    0.0, 1.0
+                ), 4)
+                relevant_chunks = [
+                    {
+                        'content': doc,
+                        'metadata': metadata,
+                        'similarity_score': float(sims[i]),
+                        'rank': i + 1
+                    }
+                    for i, (doc, metadata) in enumerate(zip(
+                        results['documents'][0],
+                        results['metadatas'][0]
+                    ))
+                    if sims[i] >= min_relevance_score
+                ]
             
             return relevant_chunks
             
         except Exception as e:
-            print(f"Search error: {str(e)}")
+            logger.warning("Search error: %s", e)
             return []
     
     async def get_document_chunks(self, document_id: str) -> List[Dict[str, Any]]:
@@ -188,7 +419,7 @@ class VectorStore:
             return chunks
             
         except Exception as e:
-            print(f"Error retrieving document chunks: {str(e)}")
+            logger.warning("Error retrieving document chunks: %s", e)
             return []
     
     async def delete_document(self, document_id: str) -> bool:
@@ -202,31 +433,71 @@ class VectorStore:
             
             if results['ids']:
                 self.collection.delete(ids=results['ids'])
+                if self._doc_id_cache is not None:
+                    self._doc_id_cache.discard(document_id)
+                self._count = max(0, self._count - len(results['ids']))
                 return True
             
             return False
             
         except Exception as e:
-            print(f"Error deleting document: {str(e)}")
+            logger.warning("Error deleting document: %s", e)
             return False
     
+    async def _embed_query(self, query: str) -> np.ndarray:
+        """Embed a single query, serving repeats from the LRU cache"""
+        key = hashlib.blake2b(
+            f"{settings.embedding_model}:{query}".encode(), digest_size=16
+        ).digest()
+
+        async with self._query_cache_lock:
+            cached = self._query_cache.get(key)
+            if cached is not None:
+                self._query_cache.move_to_end(key)
+                return cached.astype(np.float32) / self._QUANT_SCALE
+
+        embedding = await self._batcher.submit(query)
+
+        async with self._query_cache_lock:
+            self._query_cache[key] = np.clip(
+                np.round(embedding * self._QUANT_SCALE), -127, 127
+            ).astype(np.int8)
+            self._query_cache.move_to_end(key)
+            while len(self._query_cache) > self._query_cache_max:
+                self._query_cache.popitem(last=False)
+
+        return embedding
+
     async def _generate_embeddings(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings for a list of texts"""
         # Run embedding generation in a thread to avoid blocking
         loop = asyncio.get_event_loop()
-        embeddings = await loop.run_in_executor(
-            None, 
-            self.embedding_model.encode, 
-            texts
-        )
-        return embeddings
+
+        if len(texts) > 1:
+            # Length-bucketing: encoding texts in length order keeps batches
+            # tightly packed (fewer pad tokens), then results are scattered
+            # back into the caller's order
+            order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+            embeddings = await loop.run_in_executor(
+                self._embed_pool, self._encode, [texts[i] for i in order]
+            )
+            restored = np.empty_like(embeddings)
+            restored[order] = embeddings
+            return restored
+
+        return await loop.run_in_executor(self._embed_pool, self._encode, texts)
     
-    def get_collection_stats(self) -> Dict[str, Any]:
-        """Get statistics about the vector collection"""
+    def get_collection_stats(self, refresh: bool = False) -> Dict[str, Any]:
+        """Get statistics about the vector collection
+
+        Serves the locally maintained chunk counter; pass refresh=True to
+        re-sync it from ChromaDB.
+        """
         try:
-            count = self.collection.count()
+            if refresh:
+                self._count = self.collection.count()
             return {
-                'total_chunks': count,
+                'total_chunks': self._count,
                 'collection_name': self.collection_name,
                 'embedding_model': settings.embedding_model
             }
@@ -238,17 +509,19 @@ class VectorStore:
     def list_documents(self) -> List[str]:
         """List all unique document IDs in the collection"""
         try:
-            results = self.collection.get(include=['metadatas'])
-            document_ids = set()
+            if self._doc_id_cache is None:
+                # One-time scan; afterwards the cache tracks store/delete
+                results = self.collection.get(include=['metadatas'])
+                self._doc_id_cache = {
+                    metadata['document_id']
+                    for metadata in results['metadatas']
+                    if 'document_id' in metadata
+                }
             
-            for metadata in results['metadatas']:
-                if 'document_id' in metadata:
-                    document_ids.add(metadata['document_id'])
-            
-            return list(document_ids)
+            return list(self._doc_id_cache)
             
         except Exception as e:
-            print(f"Error listing documents: {str(e)}")
+            logger.warning("Error listing documents: %s", e)
             return []
 
 
@@ -283,27 +556,37 @@ class RAGPipeline:
             min_relevance_score=0.3
         )
         
-        # Combine context while respecting length limit
-        combined_context = ""
+        # Combine context while respecting length limit; collecting parts
+        # and joining once keeps assembly linear instead of quadratic
+        separator = "\n\n---\n\n"
+        parts = []
         selected_chunks = []
         current_length = 0
-        
+
         for chunk in relevant_chunks:
             chunk_text = chunk['content']
-            chunk_length = len(chunk_text)
-            
-            if current_length + chunk_length <= max_context_length:
-                if combined_context:
-                    combined_context += "\n\n---\n\n"
-                combined_context += chunk_text
-                current_length += chunk_length + 10  # Account for separator
-                selected_chunks.append(chunk)
-            else:
+
+            if current_length + len(chunk_text) > max_context_length:
                 break
-        
-        return combined_context, selected_chunks
+
+            parts.append(chunk_text)
+            current_length += len(chunk_text) + len(separator)
+            selected_chunks.append(chunk)
+
+        return separator.join(parts), selected_chunks
+
+
+@functools.lru_cache()
+def get_vector_store() -> VectorStore:
+    """Lazily construct the process-wide vector store
+
+    Building VectorStore loads the SBERT model; deferring it to first
+    use keeps import (and workers that never touch embeddings) lean.
+    """
+    return VectorStore()
 
 
-# Global instances
-vector_store = VectorStore()
-rag_pipeline = RAGPipeline(vector_store)
\ No newline at end of file
+@functools.lru_cache()
+def get_rag_pipeline() -> RAGPipeline:
+    """Lazily construct the RAG pipeline over the shared vector store"""
+    return RAGPipeline(get_vector_store())
\ No newline at end of file
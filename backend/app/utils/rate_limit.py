@@ -0,0 +1,64 @@
+"""
+Token-bucket rate limiting for expensive endpoints
+"""
+import time
+from typing import Dict, Tuple
+
+from fastapi import HTTPException, Request
+
+
+class TokenBucket:
+    """Per-client token bucket usable as a FastAPI dependency
+
+    Each client IP holds a bucket of `capacity` tokens refilled at
+    `refill_rate` tokens per second. A request consumes one token; when
+    the bucket is empty the request is rejected with 429 and a
+    Retry-After hint, shedding bursts before they thrash the embedding
+    model or the vector store.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float, max_clients: int = 10_000):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.max_clients = max_clients
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def _take(self, key: str) -> float:
+        """Consume one token; returns 0.0 on success or seconds to wait"""
+        now = time.monotonic()
+        tokens, last_refill = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - last_refill) * self.refill_rate)
+
+        if len(self._buckets) >= self.max_clients and key not in self._buckets:
+            self._prune(now)
+
+        if tokens >= 1.0:
+            self._buckets[key] = (tokens - 1.0, now)
+            return 0.0
+
+        self._buckets[key] = (tokens, now)
+        return (1.0 - tokens) / self.refill_rate
+
+    def _prune(self, now: float):
+        """Drop buckets that have fully refilled — they carry no state"""
+        idle = self.capacity / self.refill_rate
+        self._buckets = {
+            key: entry
+            for key, entry in self._buckets.items()
+            if now - entry[1] < idle
+        }
+
+    async def __call__(self, request: Request):
+        key = request.client.host if request.client else "unknown"
+        wait = self._take(key)
+        if wait > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="Rate limit exceeded. Please retry later.",
+                headers={"Retry-After": str(max(1, round(wait)))}
+            )
+
+
+# Uploads drive embedding + Chroma writes; queries drive SBERT + HNSW
+upload_rate_limit = TokenBucket(capacity=10, refill_rate=5.0)
+query_rate_limit = TokenBucket(capacity=40, refill_rate=20.0)
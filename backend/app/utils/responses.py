@@ -0,0 +1,26 @@
+"""
+Custom response classes for fast JSON serialization
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson
+
+    orjson serializes datetimes and numpy scalars natively and is several times
+    faster than the stdlib encoder for the nested dict/list payloads returned
+    by the claims and documents endpoints. Unknown types (e.g. ObjectId) fall
+    back to str().
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=str,
+            option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY
+        )